@@ -1,13 +1,26 @@
 import os
+import base64
+import json
+import queue
 import sqlite3
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
-from datetime import datetime, timedelta
-from flask import Flask, jsonify, request
+from datetime import datetime
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
-from huggingface_hub import InferenceClient
 from huggingface_hub.errors import HfHubHTTPError
+from cache import CACHE_BACKEND, LookupStats, SingleFlight, SqliteCache, build_cache, normalize_topic
+from compression import LOG_COMPRESSOR
+from db import LOG_WRITER_ENABLED, ConnectionPool, LogWriter, load_log_dictionaries, migrate_log_schema
+from extract import EXTRACTION_STATS, extract_text
+from packing import extractive_brief, pack_evidence
+from http_pool import get_http_session, pool_stats, read_before_deadline
+from semantic_cache import build_semantic_cache
+from inference import INFERENCE_CLIENTS, TokenScheduler
+from jobs import JOB_RETENTION_MINUTES, JobManager, JobQueueFull
 from werkzeug.exceptions import BadRequest
 
 # Load variables from .env file
@@ -27,6 +40,8 @@ while True:
 if not hf_tokens:
     raise ValueError("❌ No Hugging Face API keys (HF_TOKEN_1, etc.) found in .env file!")
 
+TOKEN_SCHEDULER = TokenScheduler(len(hf_tokens))
+
 news_api_key = os.getenv("NEWS_API_KEY")
 jina_api_key = os.getenv("JINA_API_KEY")
 
@@ -37,14 +52,153 @@ SUPPORTED_MODELS = {
     "phi3": "microsoft/Phi-3-mini-4k-instruct"
 }
 DEFAULT_MODEL = "llama3"
+# Context window (prompt + completion tokens) of each supported model.
+MODEL_CONTEXT_WINDOWS = {
+    "llama3": 8192,
+    "mistral": 32768,
+    "gemma": 8192,
+    "phi3": 4096
+}
 
 app = Flask(__name__)
 CORS(app)
 DATABASE_FILE = 'database.db'
+DB_POOL = ConnectionPool(DATABASE_FILE)
+INSERT_LOG_ENTRY = "INSERT INTO conversation_logs (timestamp, kind, user_message, ai_response) VALUES (?, ?, ?, ?);"
+LOG_WRITER = LogWriter(DB_POOL, INSERT_LOG_ENTRY) if LOG_WRITER_ENABLED else None
+if os.path.exists(DATABASE_FILE):
+    with DB_POOL.connection() as conn:
+        migrate_log_schema(conn)
+        load_log_dictionaries(conn)
+
+# --- Log History & Search ---
+# Largest page /logs and /logs/search will return.
+LOG_SEARCH_MAX_LIMIT = int(os.getenv("LOG_SEARCH_MAX_LIMIT", "100"))
+LOG_KINDS = ("osint", "debate", "other")
+# bm25 column weights: a hit in the prompt/topic counts more than one in the long response.
+# Ranking only needs the index; snippets (which decompress the response bodies) are then
+# built for the rows on the requested page alone.
+SEARCH_LOGS = """
+    SELECT rowid, bm25(conversation_logs_fts, 4.0, 1.0) AS score
+    FROM conversation_logs_fts
+    WHERE conversation_logs_fts MATCH ?
+    ORDER BY score
+    LIMIT ? OFFSET ?
+"""
+SEARCH_LOG_SNIPPETS = """
+    SELECT l.id, l.timestamp, l.user_message, snippet(conversation_logs_fts, 1, '[', ']', '…', 24)
+    FROM conversation_logs_fts
+    JOIN conversation_logs AS l ON l.id = conversation_logs_fts.rowid
+    WHERE conversation_logs_fts MATCH ? AND conversation_logs_fts.rowid IN ({placeholders})
+"""
+
+# --- Result Caches ---
+CACHE_EXPIRATION_MINUTES = int(os.getenv("CACHE_EXPIRATION_MINUTES", "60"))
+# Stale-while-revalidate: for this long after expiry a debate is still served immediately
+# while it is recomputed in the background. After that it must be recomputed inline.
+CACHE_STALE_GRACE_MINUTES = int(os.getenv("CACHE_STALE_GRACE_MINUTES", "30"))
+DEBATE_CACHE = build_cache(
+    "debate",
+    ttl_seconds=CACHE_EXPIRATION_MINUTES * 60,
+    max_entries=int(os.getenv("DEBATE_CACHE_MAX_ENTRIES", "256")),
+    max_bytes=int(os.getenv("DEBATE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    sweep_interval=int(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "60")),
+    stale_seconds=CACHE_STALE_GRACE_MINUTES * 60
+)
+# Concurrent requests for the same cache_key share one pipeline run.
+DEBATE_FLIGHTS = SingleFlight(DEBATE_CACHE)
+DEBATE_LOOKUPS = LookupStats()
+
+# OSINT reports get their own TTL and capacity.
+OSINT_CACHE_TTL_MINUTES = int(os.getenv("OSINT_CACHE_TTL_MINUTES", "30"))
+OSINT_CACHE = build_cache(
+    "osint",
+    ttl_seconds=OSINT_CACHE_TTL_MINUTES * 60,
+    max_entries=int(os.getenv("OSINT_CACHE_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("OSINT_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    sweep_interval=int(os.getenv("CACHE_SWEEP_INTERVAL_SECONDS", "60"))
+)
+OSINT_FLIGHTS = SingleFlight(OSINT_CACHE)
+OSINT_LOOKUPS = LookupStats()
+
+# Optional paraphrase-tolerant caches (SEMANTIC_CACHE_ENABLED); None when disabled.
+DEBATE_SEMANTIC_CACHE = build_semantic_cache("debate", CACHE_EXPIRATION_MINUTES * 60)
+OSINT_SEMANTIC_CACHE = build_semantic_cache("osint", OSINT_CACHE_TTL_MINUTES * 60)
+
+# Background refreshes of stale entries; kept separate from AGENT_EXECUTOR so a burst of
+# refreshes can never starve the debater calls they depend on.
+REFRESH_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("REFRESH_MAX_WORKERS", "2")),
+                                      thread_name_prefix="atlas-refresh")
+REFRESHING_KEYS = set()
+REFRESHING_LOCK = threading.Lock()
 
-# --- Simple In-Memory Cache ---
-DEBATE_CACHE = {}
-CACHE_EXPIRATION_MINUTES = 60
+# --- Background Jobs ---
+# With the shared SQLite backend, job snapshots are published there so a poll that lands
+# on a different gunicorn worker still finds the job.
+JOB_STORE = build_cache("jobs", ttl_seconds=JOB_RETENTION_MINUTES * 60, max_entries=10000,
+                        max_bytes=64 * 1024 * 1024) if CACHE_BACKEND == "sqlite" else None
+JOBS = JobManager(store=JOB_STORE)
+
+# --- Agent Executor ---
+# Shared, bounded pool for independent LLM calls (e.g. the two debaters).
+AGENT_MAX_WORKERS = int(os.getenv("AGENT_MAX_WORKERS", "8"))
+AGENT_EXECUTOR = ThreadPoolExecutor(max_workers=AGENT_MAX_WORKERS, thread_name_prefix="atlas-agent")
+
+# --- Evidence Gathering ---
+# Reader fetches run concurrently; the whole evidence step must finish within the deadline.
+READER_MAX_WORKERS = int(os.getenv("READER_MAX_WORKERS", "12"))
+READER_EXECUTOR = ThreadPoolExecutor(max_workers=READER_MAX_WORKERS, thread_name_prefix="atlas-reader")
+READER_TIMEOUT_SECONDS = 20
+EVIDENCE_DEADLINE_SECONDS = float(os.getenv("EVIDENCE_DEADLINE_SECONDS", "25"))
+
+# Two-level, disk-backed evidence cache: NewsAPI searches by normalized query and reader
+# bodies by URL. Expired entries are kept for EVIDENCE_REVALIDATE_HOURS so they can be
+# revalidated with ETag / Last-Modified instead of being downloaded again.
+EVIDENCE_CACHE_FILE = os.getenv("EVIDENCE_CACHE_FILE", "evidence_cache.db")
+EVIDENCE_REVALIDATE_HOURS = int(os.getenv("EVIDENCE_REVALIDATE_HOURS", "24"))
+NEWS_SEARCH_CACHE = SqliteCache(
+    ttl_seconds=int(os.getenv("NEWS_SEARCH_TTL_MINUTES", "15")) * 60,
+    namespace="news_search",
+    path=EVIDENCE_CACHE_FILE,
+    max_entries=int(os.getenv("NEWS_SEARCH_CACHE_MAX_ENTRIES", "5000")),
+    max_bytes=int(os.getenv("NEWS_SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    stale_seconds=EVIDENCE_REVALIDATE_HOURS * 3600
+)
+ARTICLE_CACHE = SqliteCache(
+    ttl_seconds=int(os.getenv("ARTICLE_CACHE_TTL_HOURS", "24")) * 3600,
+    namespace="article_body",
+    path=EVIDENCE_CACHE_FILE,
+    max_entries=int(os.getenv("ARTICLE_CACHE_MAX_ENTRIES", "20000")),
+    max_bytes=int(os.getenv("ARTICLE_CACHE_MAX_BYTES", str(256 * 1024 * 1024))),
+    stale_seconds=EVIDENCE_REVALIDATE_HOURS * 3600
+)
+EVIDENCE_LOOKUPS = LookupStats()
+
+# Evidence packing: the articles put into a prompt are trimmed to the smaller of this budget
+# and what the model's context window leaves after the completion and the prompt template.
+EVIDENCE_TOKEN_BUDGET = int(os.getenv("EVIDENCE_TOKEN_BUDGET", "6000"))
+COMPLETION_MAX_TOKENS = 1024
+PROMPT_OVERHEAD_TOKENS = int(os.getenv("PROMPT_OVERHEAD_TOKENS", "512"))
+
+# Optional evidence brief: "extractive" (CPU) or "llm" (one call on EVIDENCE_BRIEF_MODEL) condenses
+# the evidence once per topic, and that brief replaces the articles in every role prompt.
+# It is cached per normalized topic, so debates and OSINT reports on a topic share it.
+EVIDENCE_BRIEF_MODE = os.getenv("EVIDENCE_BRIEF_MODE", "off").lower()
+EVIDENCE_BRIEF_TOKENS = int(os.getenv("EVIDENCE_BRIEF_TOKENS", "800"))
+EVIDENCE_BRIEF_MODEL = os.getenv("EVIDENCE_BRIEF_MODEL", "phi3")
+if EVIDENCE_BRIEF_MODE not in ("off", "extractive", "llm"):
+    print(f"⚠️ Unknown EVIDENCE_BRIEF_MODE '{EVIDENCE_BRIEF_MODE}'; evidence briefs disabled.")
+    EVIDENCE_BRIEF_MODE = "off"
+if EVIDENCE_BRIEF_MODEL not in SUPPORTED_MODELS:
+    print(f"⚠️ EVIDENCE_BRIEF_MODEL '{EVIDENCE_BRIEF_MODEL}' is not supported; using '{DEFAULT_MODEL}'.")
+    EVIDENCE_BRIEF_MODEL = DEFAULT_MODEL
+EVIDENCE_BRIEF_CACHE = build_cache(
+    "evidence_brief",
+    ttl_seconds=int(os.getenv("EVIDENCE_BRIEF_TTL_MINUTES", "60")) * 60,
+    max_entries=int(os.getenv("EVIDENCE_BRIEF_MAX_ENTRIES", "512")),
+    max_bytes=int(os.getenv("EVIDENCE_BRIEF_MAX_BYTES", str(8 * 1024 * 1024)))
+)
+EVIDENCE_BRIEF_FLIGHTS = SingleFlight(EVIDENCE_BRIEF_CACHE)
 
 # --- ROLE PROMPTS ---
 ROLE_PROMPTS = {
@@ -61,106 +215,613 @@ ROLE_PROMPTS = {
         "3. 'Legitimacy of the Information', "
         "4. 'Final Conclusion'."
     ),
+    "evidence_summarizer": (
+        "You are a research assistant. Condense the source articles into a compact, neutral "
+        "evidence brief of short bullet points. Keep concrete facts, figures, dates and claims, "
+        "attribute each point to its source in parentheses, and do not add opinions."
+    ),
     "generic_agent": "You are a helpful AI assistant."
 }
+DEBATER_ROLES = ("tech_optimist", "ai_ethicist")
 
 # --- Helper Functions ---
 def get_db_connection():
-    conn = sqlite3.connect(DATABASE_FILE)
-    return conn
+    """Borrows a pooled connection: `with get_db_connection() as conn: ...`."""
+    return DB_POOL.connection()
 
-def add_log_entry(conn, user_message, ai_response):
-    INSERT_LOG_ENTRY = "INSERT INTO conversation_logs (timestamp, user_message, ai_response) VALUES (?, ?, ?);"
-    with conn:
-        timestamp = datetime.now().isoformat()
-        conn.execute(INSERT_LOG_ENTRY, (timestamp, user_message, ai_response))
+def add_log_entry(kind, user_message, ai_response):
+    """Logs a conversation; queued for the batching writer unless LOG_WRITER_ENABLED is off."""
+    row = (datetime.now().isoformat(), kind, user_message, LOG_COMPRESSOR.compress(ai_response))
+    if LOG_WRITER is not None:
+        LOG_WRITER.write(row)
+        return
+    with get_db_connection() as conn:
+        conn.execute(INSERT_LOG_ENTRY, row)
 
-def call_ai_agent(model_id, system_prompt, user_message, max_tokens=1024):
+def extract_completion_text(completion):
+    """Handles different response formats safely."""
+    # Handle OpenAI-style dict
+    if hasattr(completion, "choices") and completion.choices:
+        choice = completion.choices[0]
+        if isinstance(choice, dict) and "message" in choice:
+            return choice["message"].get("content", "")
+        if hasattr(choice, "message"):
+            return choice.message.get("content", "")
+
+    # Handle HuggingFace text style
+    if hasattr(completion, "generated_text"):
+        return completion.generated_text
+
+    return str(completion)
+
+def extract_stream_delta(chunk):
+    """Pulls the text delta out of one chat_completion(stream=True) chunk."""
+    if hasattr(chunk, "choices") and chunk.choices:
+        choice = chunk.choices[0]
+        if isinstance(choice, dict):
+            return (choice.get("delta") or {}).get("content") or ""
+        if getattr(choice, "delta", None) is not None:
+            return choice.delta.get("content") or ""
+    return ""
+
+def build_messages(system_prompt, user_message):
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_message}
+    ]
+
+def handle_token_error(i, e):
+    """Records a failed call on token #i. Returns True if the next token should be tried."""
+    status_code = e.response.status_code
+    if status_code in [402, 429]:
+        print(f"⚠️ Token #{i + 1} failed: {e}. Trying next token.")
+        TOKEN_SCHEDULER.record_failure(i, status_code, e.response.headers.get("Retry-After"))
+        return True
+    if status_code == 401:
+        # Token was revoked or rotated out: drop its cached clients and move on.
+        print(f"⚠️ Token #{i + 1} was rejected: {e}. Discarding its clients.")
+        INFERENCE_CLIENTS.discard_token(hf_tokens[i])
+        TOKEN_SCHEDULER.record_failure(i, status_code)
+        return True
+    return False
+
+def call_ai_agent(model_id, system_prompt, user_message, max_tokens=COMPLETION_MAX_TOKENS):
     """
     Calls the Hugging Face API using a pool of tokens with fallback logic.
-    Handles different response formats safely.
+    Tokens are tried healthiest-first, as ranked by TOKEN_SCHEDULER.
     """
-    for i, token in enumerate(hf_tokens):
+    for i in TOKEN_SCHEDULER.ordered_tokens():
         print(f"Attempting to call AI with token #{i + 1}...")
-        try:
-            client = InferenceClient(model=model_id, token=token)
-            completion = client.chat_completion(
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                max_tokens=max_tokens,
-            )
-
-            # 🔎 Debug print
-            print("🔍 Raw completion object:", completion)
-
-            # Handle OpenAI-style dict
-            if hasattr(completion, "choices") and completion.choices:
-                choice = completion.choices[0]
-                if isinstance(choice, dict) and "message" in choice:
-                    return choice["message"].get("content", "")
-                if hasattr(choice, "message"):
-                    return choice.message.get("content", "")
-
-            # Handle HuggingFace text style
-            if hasattr(completion, "generated_text"):
-                return completion.generated_text
-
-            return str(completion)
-
-        except HfHubHTTPError as e:
-            if e.response.status_code in [402, 429]:
-                print(f"⚠️ Token #{i + 1} failed: {e}. Trying next token.")
-                continue
-            else:
+        with TOKEN_SCHEDULER.lease(i):
+            try:
+                client = INFERENCE_CLIENTS.get(model_id, hf_tokens[i])
+                completion = client.chat_completion(
+                    messages=build_messages(system_prompt, user_message),
+                    max_tokens=max_tokens,
+                )
+
+                # 🔎 Debug print
+                print("🔍 Raw completion object:", completion)
+
+                TOKEN_SCHEDULER.record_success(i)
+                return extract_completion_text(completion)
+
+            except HfHubHTTPError as e:
+                if handle_token_error(i, e):
+                    continue
                 raise e
     raise Exception("All available API tokens have failed.")
 
+def stream_ai_agent(model_id, system_prompt, user_message, max_tokens=COMPLETION_MAX_TOKENS):
+    """
+    Streaming counterpart of call_ai_agent: yields text deltas as the model produces them.
+    Falling back to another token is only possible before the first delta has been sent.
+    """
+    for i in TOKEN_SCHEDULER.ordered_tokens():
+        print(f"Attempting to stream AI with token #{i + 1}...")
+        started = False
+        with TOKEN_SCHEDULER.lease(i):
+            try:
+                client = INFERENCE_CLIENTS.get(model_id, hf_tokens[i])
+                for chunk in client.chat_completion(
+                    messages=build_messages(system_prompt, user_message),
+                    max_tokens=max_tokens,
+                    stream=True,
+                ):
+                    delta = extract_stream_delta(chunk)
+                    if delta:
+                        started = True
+                        yield delta
+                TOKEN_SCHEDULER.record_success(i)
+                return
+
+            except HfHubHTTPError as e:
+                if not started and handle_token_error(i, e):
+                    continue
+                raise e
+    raise Exception("All available API tokens have failed.")
+
+def fetch_cached(cache, key, url, headers, timeout, parse, deadline=None):
+    """
+    GETs `url` through a disk-backed evidence cache. Fresh entries are served as-is; stale
+    ones are revalidated with If-None-Match / If-Modified-Since and only re-downloaded if
+    the resource changed. `parse` turns a 200 response into the value to cache.
+    With a `deadline` (time.monotonic()), the download is abandoned when it passes.
+    """
+    entry = cache.get_entry(key)
+    if entry and not entry["stale"]:
+        EVIDENCE_LOOKUPS.record(f"{cache.namespace}_hit")
+        return entry["value"]["data"]
+
+    request_headers = dict(headers)
+    if entry:
+        if entry["value"].get("etag"):
+            request_headers["If-None-Match"] = entry["value"]["etag"]
+        if entry["value"].get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["value"]["last_modified"]
+
+    if deadline is None:
+        response = get_http_session().get(url, headers=request_headers, timeout=timeout)
+    else:
+        timeout = min(timeout, deadline - time.monotonic())
+        if timeout <= 0:
+            raise requests.exceptions.Timeout(f"Deadline passed before fetching {url}")
+        response = read_before_deadline(
+            get_http_session().get(url, headers=request_headers, timeout=timeout, stream=True), deadline)
+    if response.status_code == 304 and entry:
+        EVIDENCE_LOOKUPS.record(f"{cache.namespace}_revalidated")
+        cache.set(key, entry["value"])
+        return entry["value"]["data"]
+    response.raise_for_status()
+
+    data = parse(response)
+    EVIDENCE_LOOKUPS.record(f"{cache.namespace}_miss")
+    cache.set(key, {
+        "data": data,
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified")
+    })
+    return data
+
+def format_article(article, content):
+    return (
+        f"--- ARTICLE START ---\n"
+        f"SOURCE: {article['source']['name']}\n"
+        f"HEADLINE: {article['title']}\n"
+        f"AUTHOR: {article.get('author', 'Not specified')}\n\n"
+        f"CONTENT:\n{content}\n"
+        f"--- ARTICLE END ---\n\n"
+    )
+
+def format_headlines(articles):
+    headlines = ""
+    for article in articles:
+        headlines += f"- Headline: '{article['title']}' (Source: {article['source']['name']})\n"
+    return headlines
+
+def news_search_url(topic):
+    return f"https://newsapi.org/v2/everything?q={topic}&sortBy=relevancy&pageSize=3&apiKey={news_api_key}"
+
+def read_article(article, timeout, deadline):
+    """Reads one article through the Jina reader. Returns a formatted block, or None on failure or at the deadline."""
+    url = article['url']
+    reader_url = f"https://r.jina.ai/{url}"
+    headers = {"Authorization": f"Bearer {jina_api_key}"}
+    try:
+        content = fetch_cached(ARTICLE_CACHE, url, reader_url, headers, timeout,
+                               lambda response: extract_text(response.text, response.headers.get("Content-Type"), url),
+                               deadline=deadline)
+        return format_article(article, content)
+    except requests.exceptions.RequestException as e:
+        print(f"Warning: Could not read URL {url}: {e}")
+        return None
+
+class EvidenceUnavailable(Exception):
+    """
+    Raised by get_article_content when no article could be read. str(e) is the text to prompt
+    with instead (an explanation, or the headlines); it must not be cached as the topic's evidence.
+    """
+
 def get_article_content(topic: str) -> str:
-    """Fetches and reads articles, with a fallback to headlines."""
+    """
+    Fetches and reads articles, raising EvidenceUnavailable (with the headlines as a fallback
+    when there are any) if none could be read.
+    Reader fetches run concurrently under EVIDENCE_DEADLINE_SECONDS; articles that are not
+    back by then are dropped (their downloads are abandoned at the deadline, freeing their
+    threads) and the rest are kept in NewsAPI relevance order.
+    """
     if not news_api_key or not jina_api_key:
         print("⚠️ OSINT keys not found. Disabling evidence gathering.")
-        return "OSINT evidence gathering is disabled due to missing API keys."
+        raise EvidenceUnavailable("OSINT evidence gathering is disabled due to missing API keys.")
         
     print(f"Fetching and reading articles for topic: {topic}")
+    deadline = time.monotonic() + EVIDENCE_DEADLINE_SECONDS
     try:
-        news_url = (f"https://newsapi.org/v2/everything?q={topic}&sortBy=relevancy&pageSize=3&apiKey={news_api_key}")
-        news_response = requests.get(news_url)
-        news_response.raise_for_status()
-        articles = news_response.json().get("articles", [])
+        articles = fetch_cached(NEWS_SEARCH_CACHE, normalize_topic(topic), news_search_url(topic), {},
+                                min(READER_TIMEOUT_SECONDS, EVIDENCE_DEADLINE_SECONDS),
+                                lambda response: response.json().get("articles", []))
         if not articles: 
-            return "No relevant articles found."
-
-        full_text, headlines = "", ""
-        for article in articles:
-            headlines += f"- Headline: '{article['title']}' (Source: {article['source']['name']})\n"
-            url = article['url']
-            reader_url = f"https://r.jina.ai/{url}"
-            headers = {"Authorization": f"Bearer {jina_api_key}"}
-            try:
-                content_response = requests.get(reader_url, headers=headers, timeout=20)
-                if content_response.ok:
-                    soup = BeautifulSoup(content_response.text, 'html.parser')
-                    full_text += (
-                        f"--- ARTICLE START ---\n"
-                        f"SOURCE: {article['source']['name']}\n"
-                        f"HEADLINE: {article['title']}\n"
-                        f"AUTHOR: {article.get('author', 'Not specified')}\n\n"
-                        f"CONTENT:\n{soup.get_text()}\n"
-                        f"--- ARTICLE END ---\n\n"
-                    )
-            except requests.exceptions.RequestException as e:
-                print(f"Warning: Could not read URL {url}: {e}")
+            raise EvidenceUnavailable("No relevant articles found.")
+
+        headlines = format_headlines(articles)
+
+        # Reads check the deadline themselves and give up (closing their response) when it
+        # passes, so stragglers free their READER_EXECUTOR thread instead of starving later topics.
+        futures = [READER_EXECUTOR.submit(read_article, article, READER_TIMEOUT_SECONDS, deadline)
+                   for article in articles]
+        done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+        if not_done:
+            print(f"⏱️ {len(not_done)} article(s) missed the {EVIDENCE_DEADLINE_SECONDS}s evidence deadline.")
+            for future in not_done:
+                future.cancel()  # Only stops reads that have not started yet.
+
+        full_text = "".join(future.result() or "" for future in futures if future in done)
         
         if not full_text:
             print("⚠️ Web Reader failed. Falling back to using headlines only.")
-            return f"Here is a summary of recent news headlines:\n{headlines}"
+            raise EvidenceUnavailable(f"Here is a summary of recent news headlines:\n{headlines}")
             
         return full_text
     except requests.exceptions.RequestException as e:
         print(f"❌ Could not fetch news headlines: {e}")
-        return "Could not retrieve any news articles."
+        raise EvidenceUnavailable("Could not retrieve any news articles.")
+
+def evidence_token_budget(model_id):
+    model_key = next((key for key, value in SUPPORTED_MODELS.items() if value == model_id), None)
+    context_window = MODEL_CONTEXT_WINDOWS.get(model_key, min(MODEL_CONTEXT_WINDOWS.values()))
+    return max(0, min(EVIDENCE_TOKEN_BUDGET, context_window - COMPLETION_MAX_TOKENS - PROMPT_OVERHEAD_TOKENS))
+
+def pack_evidence_for_model(article_text, topic, model_id):
+    """Ranks, dedupes and truncates the evidence so the prompt fits the model's context window."""
+    packed_text, stats = pack_evidence(article_text, topic, evidence_token_budget(model_id))
+    print(f"📦 Packed evidence for {model_id}: {stats['input_tokens']} -> {stats['packed_tokens']} tokens "
+          f"({stats['paragraphs_kept']}/{stats['paragraphs_total']} paragraphs, "
+          f"{stats['duplicates_dropped']} duplicates dropped, budget {stats['budget_tokens']})")
+    return packed_text
+
+def build_brief_message(topic, article_text):
+    return f"Topic: '{topic}'.\n\nSource articles:\n{article_text}"
+
+def evidence_brief_key(topic):
+    mode = f"llm-{EVIDENCE_BRIEF_MODEL}" if EVIDENCE_BRIEF_MODE == "llm" else EVIDENCE_BRIEF_MODE
+    return f"{mode}:{normalize_topic(topic)}"
+
+def summarize_evidence(topic, article_text):
+    """Builds the evidence brief, falling back to the extractive one if the LLM call fails."""
+    if EVIDENCE_BRIEF_MODE == "llm":
+        model_id = SUPPORTED_MODELS[EVIDENCE_BRIEF_MODEL]
+        try:
+            return call_ai_agent(model_id, ROLE_PROMPTS["evidence_summarizer"],
+                                 build_brief_message(topic, pack_evidence_for_model(article_text, topic, model_id)),
+                                 max_tokens=EVIDENCE_BRIEF_TOKENS)
+        except Exception as e:
+            print(f"⚠️ LLM evidence brief failed ({e}); using an extractive brief instead.")
+    return extractive_brief(article_text, topic, EVIDENCE_BRIEF_TOKENS)
+
+def prepare_evidence(topic, model_id):
+    """
+    The evidence text for a model's prompts: the shared brief if enabled, else the packed articles.
+    If no articles could be read, the fallback text is used as it is and no brief is cached.
+    """
+    try:
+        if EVIDENCE_BRIEF_MODE == "off":
+            return pack_evidence_for_model(get_article_content(topic), topic, model_id)
+
+        cache_key = evidence_brief_key(topic)
+        brief = EVIDENCE_BRIEF_CACHE.get(cache_key)
+        if brief is not None:
+            print(f"♻️ Reusing cached evidence brief for topic: '{topic}'")
+            return brief
+        return EVIDENCE_BRIEF_FLIGHTS.do(cache_key, lambda: summarize_evidence(topic, get_article_content(topic)))
+    except EvidenceUnavailable as e:
+        return pack_evidence_for_model(str(e), topic, model_id)
+
+def build_osint_message(topic, article_text):
+    return f"Here is the topic for analysis: '{topic}'.\n\nHere are the source articles I have retrieved:\n{article_text}"
+
+def build_debater_message(role, topic, article_text):
+    return (f"Here is the content of relevant articles:\n{article_text}\n\n"
+            f"Based on this evidence and your role as the {role.replace('_', ' ')}, "
+            f"what is your opening statement on the topic of: '{topic}'?")
+
+def build_audit_transcript(topic, debate_transcript):
+    transcript_for_audit = f"Debate Topic: '{topic}'.\n\n"
+    for role, statement in debate_transcript.items():
+        transcript_for_audit += f"--- STATEMENT FROM: {role.replace('_', ' ').title()} ---\n{statement}\n\n"
+    return transcript_for_audit
+
+def build_moderator_message(transcript_for_audit, audit_report):
+    return f"DEBATE TRANSCRIPT:\n{transcript_for_audit}\n\nBIAS AUDIT REPORT:\n{audit_report}"
+
+def _elapsed(since):
+    return round(time.perf_counter() - since, 3)
+
+def run_debate_pipeline(topic, model_id):
+    """
+    Runs the full debate: evidence -> debaters (concurrently) -> bias audit -> synthesis.
+    Returns the response payload, including per-stage timings in seconds.
+    """
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    article_text = prepare_evidence(topic, model_id)
+    timings["evidence"] = _elapsed(stage_start)
+
+    # The debaters don't depend on each other, so fan them out on the shared executor.
+    stage_start = time.perf_counter()
+    futures = {
+        role: AGENT_EXECUTOR.submit(call_ai_agent, model_id, ROLE_PROMPTS[role],
+                                    build_debater_message(role, topic, article_text))
+        for role in DEBATER_ROLES
+    }
+    try:
+        debate_transcript = {role: future.result() for role, future in futures.items()}
+    except Exception:
+        for future in futures.values():
+            future.cancel()
+        raise
+    timings["debaters"] = _elapsed(stage_start)
+
+    stage_start = time.perf_counter()
+    transcript_for_audit = build_audit_transcript(topic, debate_transcript)
+    audit_report = call_ai_agent(model_id, ROLE_PROMPTS["bias_auditor"], transcript_for_audit)
+    timings["audit"] = _elapsed(stage_start)
+
+    stage_start = time.perf_counter()
+    text_for_moderator = build_moderator_message(transcript_for_audit, audit_report)
+    final_synthesis = call_ai_agent(model_id, ROLE_PROMPTS["moderator"], text_for_moderator)
+    timings["synthesis"] = _elapsed(stage_start)
+    timings["total"] = _elapsed(pipeline_start)
+
+    return {
+        "status": "success",
+        "topic": topic,
+        "debate_transcript": debate_transcript,
+        "audit_report": audit_report,
+        "final_synthesis": final_synthesis,
+        "timings": timings
+    }
+
+def stream_stage(role, model_id, system_prompt, user_message):
+    """Streams one LLM stage as 'token' events and returns the full text."""
+    parts = []
+    for delta in stream_ai_agent(model_id, system_prompt, user_message):
+        parts.append(delta)
+        yield "token", {"role": role, "delta": delta}
+    return "".join(parts)
+
+def stream_debate_pipeline(topic, model_id):
+    """
+    Streaming variant of run_debate_pipeline. Yields (event, data) pairs as the debate
+    progresses: 'evidence', 'token' (per-role deltas), 'statement' (one per debater),
+    'audit', 'synthesis' and finally 'done' with the same payload as run_debate_pipeline.
+    """
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    article_text = prepare_evidence(topic, model_id)
+    timings["evidence"] = _elapsed(stage_start)
+    yield "evidence", {"article_text": article_text}
+
+    # Both debaters stream concurrently; their deltas are interleaved through one queue.
+    stage_start = time.perf_counter()
+    events = queue.Queue()
+
+    def run_debater(role):
+        try:
+            user_message = build_debater_message(role, topic, article_text)
+            parts = []
+            for delta in stream_ai_agent(model_id, ROLE_PROMPTS[role], user_message):
+                parts.append(delta)
+                events.put(("token", {"role": role, "delta": delta}))
+            events.put(("statement", {"role": role, "text": "".join(parts)}))
+        except Exception as e:
+            events.put(("failed", e))
+
+    for role in DEBATER_ROLES:
+        AGENT_EXECUTOR.submit(run_debater, role)
+    statements = {}
+    while len(statements) < len(DEBATER_ROLES):
+        event, data = events.get()
+        if event == "failed":
+            raise data
+        if event == "statement":
+            statements[data["role"]] = data["text"]
+        yield event, data
+    debate_transcript = {role: statements[role] for role in DEBATER_ROLES}
+    timings["debaters"] = _elapsed(stage_start)
+
+    stage_start = time.perf_counter()
+    transcript_for_audit = build_audit_transcript(topic, debate_transcript)
+    audit_report = yield from stream_stage("bias_auditor", model_id, ROLE_PROMPTS["bias_auditor"], transcript_for_audit)
+    timings["audit"] = _elapsed(stage_start)
+    yield "audit", {"text": audit_report}
+
+    stage_start = time.perf_counter()
+    text_for_moderator = build_moderator_message(transcript_for_audit, audit_report)
+    final_synthesis = yield from stream_stage("moderator", model_id, ROLE_PROMPTS["moderator"], text_for_moderator)
+    timings["synthesis"] = _elapsed(stage_start)
+    yield "synthesis", {"text": final_synthesis}
+    timings["total"] = _elapsed(pipeline_start)
+
+    yield "done", {
+        "status": "success",
+        "topic": topic,
+        "debate_transcript": debate_transcript,
+        "audit_report": audit_report,
+        "final_synthesis": final_synthesis,
+        "timings": timings
+    }
+
+def stream_osint_pipeline(topic, model_id):
+    """Streaming OSINT report: yields 'evidence', the report's 'token' deltas, then 'done'."""
+    article_text = prepare_evidence(topic, model_id)
+    yield "evidence", {"article_text": article_text}
+    report = yield from stream_stage("osint_analyst", model_id, ROLE_PROMPTS["osint_analyst"],
+                                     build_osint_message(topic, article_text))
+    yield "done", {"status": "success", "topic": topic, "osint_report": report}
+
+def replay_debate(response_data):
+    """Replays a finished (e.g. cached) debate as the stage events of stream_debate_pipeline."""
+    for role, statement in response_data["debate_transcript"].items():
+        yield "statement", {"role": role, "text": statement}
+    yield "audit", {"text": response_data["audit_report"]}
+    yield "synthesis", {"text": response_data["final_synthesis"]}
+    yield "done", response_data
+
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def sse_response(events):
+    return Response(events, mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def topic_cache_key(topic, model_key):
+    return f"{normalize_topic(topic)}_{model_key}"
+
+def lookup_cached(cache, semantic_cache, lookups, topic, model_key, cache_key):
+    """
+    Looks up a result and records whether it was an exact hit, a hit that only matched
+    because of topic normalization, a semantic (paraphrase) hit, or a miss.
+    Returns (response, cache_status) where cache_status is 'fresh' or 'stale'.
+    """
+    entry = cache.get_entry(cache_key)
+    if entry is not None:
+        cached_response = entry["value"]
+        lookups.record("exact_hit" if cached_response.get("topic") == topic else "normalized_hit")
+        if entry["stale"]:
+            lookups.record("stale_served")
+            return cached_response, "stale"
+        return cached_response, "fresh"
+
+    semantic_response = lookup_semantic(semantic_cache, topic, model_key)
+    if semantic_response is not None:
+        lookups.record("semantic_hit")
+        return semantic_response, "fresh"
+
+    lookups.record("miss")
+    return None, None
+
+def get_cached_debate(topic, model_key, cache_key):
+    return lookup_cached(DEBATE_CACHE, DEBATE_SEMANTIC_CACHE, DEBATE_LOOKUPS, topic, model_key, cache_key)
+
+def get_cached_report(topic, model_key, cache_key):
+    return lookup_cached(OSINT_CACHE, OSINT_SEMANTIC_CACHE, OSINT_LOOKUPS, topic, model_key, cache_key)
+
+def with_cache_status(response_data, cache_status):
+    """Tags a response with how it was served: 'fresh', 'stale' or 'recomputed'."""
+    return dict(response_data, cache={"status": cache_status})
+
+def schedule_refresh(flights, cache_key, compute):
+    """Recomputes a stale entry in the background, at most one refresh per key at a time."""
+    refresh_key = (flights.cache.name, cache_key)
+    with REFRESHING_LOCK:
+        if refresh_key in REFRESHING_KEYS:
+            return
+        REFRESHING_KEYS.add(refresh_key)
+
+    def refresh():
+        try:
+            flights.do(cache_key, compute)
+            print(f"🔄 Refreshed stale cache entry: '{cache_key}'")
+        except Exception as e:
+            print(f"⚠️ Background refresh failed for '{cache_key}': {e}")
+        finally:
+            with REFRESHING_LOCK:
+                REFRESHING_KEYS.discard(refresh_key)
+
+    REFRESH_EXECUTOR.submit(refresh)
+
+def log_debate(topic, response_data):
+    transcript = build_audit_transcript(topic, response_data["debate_transcript"])
+    ai_response = (f"{build_moderator_message(transcript, response_data['audit_report'])}\n\n"
+                   f"FINAL SYNTHESIS:\n{response_data['final_synthesis']}")
+    add_log_entry("debate", f"Debate on: {topic}", ai_response)
+
+def compute_debate(topic, model_key, model_id):
+    response_data = run_debate_pipeline(topic, model_id)
+    log_debate(topic, response_data)
+    remember_semantic(DEBATE_SEMANTIC_CACHE, topic, model_key, response_data)
+    print(f"✅ Storing new result in cache for topic: '{topic}'")
+    return response_data
+
+def lookup_semantic(semantic_cache, topic, model_key):
+    """Returns a cached response for a paraphrase of `topic`, tagged with the match, or None."""
+    if semantic_cache is None:
+        return None
+    match = semantic_cache.lookup(topic, model_key)
+    if match is None:
+        return None
+    response_data, matched_topic, similarity = match
+    print(f"🧭 Semantic cache hit: '{topic}' ≈ '{matched_topic}' ({similarity:.2f})")
+    return dict(response_data, semantic_match={"topic": matched_topic, "similarity": round(similarity, 3)})
+
+def remember_semantic(semantic_cache, topic, model_key, response_data):
+    if semantic_cache is not None:
+        semantic_cache.add(topic, model_key, response_data)
+
+def store_cached_debate(cache_key, response_data):
+    DEBATE_CACHE.set(cache_key, response_data)
+
+def record_stage_event(partial, event, payload):
+    """Folds one streaming pipeline event into a job's partial results."""
+    if event == "token":
+        drafts = partial.setdefault("drafts", {})
+        drafts[payload["role"]] = drafts.get(payload["role"], "") + payload["delta"]
+    elif event == "evidence":
+        partial["evidence_gathered"] = True
+    elif event == "statement":
+        partial.setdefault("debate_transcript", {})[payload["role"]] = payload["text"]
+    elif event == "audit":
+        partial["audit_report"] = payload["text"]
+    elif event == "synthesis":
+        partial["final_synthesis"] = payload["text"]
+    partial["stage"] = event
+
+def run_stream_for_job(events, update):
+    """Drains a streaming pipeline into a job's partial results and returns the 'done' payload."""
+    for event, payload in events:
+        if event == "done":
+            return payload
+        update(lambda partial: record_stage_event(partial, event, payload), publish=event != "token")
+    raise Exception("Pipeline ended without a result.")
+
+def run_debate_job(topic, model_key, model_id, update):
+    cache_key = topic_cache_key(topic, model_key)
+    cached_response, cache_status = get_cached_debate(topic, model_key, cache_key)
+    if cached_response:
+        if cache_status == "stale":
+            schedule_refresh(DEBATE_FLIGHTS, cache_key, lambda: compute_debate(topic, model_key, model_id))
+        return with_cache_status(cached_response, cache_status)
+
+    def compute():
+        response_data = run_stream_for_job(stream_debate_pipeline(topic, model_id), update)
+        log_debate(topic, response_data)
+        remember_semantic(DEBATE_SEMANTIC_CACHE, topic, model_key, response_data)
+        return response_data
+
+    return with_cache_status(DEBATE_FLIGHTS.do(cache_key, compute), "recomputed")
+
+def run_osint_job(topic, model_key, model_id, update):
+    cache_key = topic_cache_key(topic, model_key)
+    cached_response, cache_status = get_cached_report(topic, model_key, cache_key)
+    if cached_response:
+        return with_cache_status(cached_response, cache_status)
+
+    def compute():
+        response_data = run_stream_for_job(stream_osint_pipeline(topic, model_id), update)
+        add_log_entry("osint", f"OSINT Analysis on: {topic}", response_data["osint_report"])
+        remember_semantic(OSINT_SEMANTIC_CACHE, topic, model_key, response_data)
+        return response_data
+
+    return with_cache_status(OSINT_FLIGHTS.do(cache_key, compute), "recomputed")
+
+JOB_RUNNERS = {
+    "debate": run_debate_job,
+    "osint": run_osint_job
+}
 
 def get_json_from_request():
     try:
@@ -170,88 +831,353 @@ def get_json_from_request():
         print(f"🚨 FAILED TO PARSE JSON. RAW REQUEST DATA:\n---\n{raw_data}\n---")
         return None
 
+def validate_topic_request(data):
+    """Validates a {topic, model} request body. Returns (topic, model_key, model_id, error_message)."""
+    if not data or 'topic' not in data:
+        return None, None, None, "Request body must be valid JSON and include 'topic'"
+
+    model_key = data.get("model", DEFAULT_MODEL)
+    model_id = SUPPORTED_MODELS.get(model_key)
+    if not model_id:
+        return None, None, None, f"Model '{model_key}' not supported."
+    return data['topic'], model_key, model_id, None
+
+def parse_topic_request(data):
+    """Like validate_topic_request, but returns a ready-made 400 response on error."""
+    topic, model_key, model_id, error_message = validate_topic_request(data)
+    if error_message:
+        return None, None, None, (jsonify({"status": "error", "message": error_message}), 400)
+    return topic, model_key, model_id, None
+
 # --- API Endpoints ---
 @app.route("/", methods=['GET'])
 def welcome():
     return jsonify({"status": "success", "message": "Welcome to the ATLAS API Server!"}), 200
 
+@app.route("/stats", methods=['GET'])
+def stats():
+    return jsonify({
+        "status": "success",
+        "http_pool": pool_stats(),
+        "db_pool": DB_POOL.stats(),
+        "log_writer": LOG_WRITER.stats() if LOG_WRITER else None,
+        "log_compression": LOG_COMPRESSOR.stats(),
+        "inference_clients": INFERENCE_CLIENTS.stats(),
+        "hf_tokens": TOKEN_SCHEDULER.stats(),
+        "debate_cache": DEBATE_CACHE.stats(),
+        "debate_single_flight": DEBATE_FLIGHTS.stats(),
+        "debate_lookups": DEBATE_LOOKUPS.snapshot(),
+        "osint_cache": OSINT_CACHE.stats(),
+        "osint_single_flight": OSINT_FLIGHTS.stats(),
+        "osint_lookups": OSINT_LOOKUPS.snapshot(),
+        "jobs": JOBS.stats(),
+        "evidence_cache": {
+            "news_search": NEWS_SEARCH_CACHE.stats(),
+            "article_body": ARTICLE_CACHE.stats(),
+            "lookups": EVIDENCE_LOOKUPS.snapshot()
+        },
+        "text_extraction": EXTRACTION_STATS.stats(),
+        "evidence_brief": {
+            "mode": EVIDENCE_BRIEF_MODE,
+            "cache": EVIDENCE_BRIEF_CACHE.stats(),
+            "single_flight": EVIDENCE_BRIEF_FLIGHTS.stats()
+        },
+        "semantic_cache": {
+            "debate": DEBATE_SEMANTIC_CACHE.stats() if DEBATE_SEMANTIC_CACHE else None,
+            "osint": OSINT_SEMANTIC_CACHE.stats() if OSINT_SEMANTIC_CACHE else None
+        }
+    }), 200
+
 @app.route("/analyze_topic", methods=['POST'])
 def analyze_topic():
-    data = get_json_from_request()
-    if not data or 'topic' not in data:
-        return jsonify({"status": "error", "message": "Request body must be valid JSON and include 'topic'"}), 400
+    topic, model_key, model_id, error_response = parse_topic_request(get_json_from_request())
+    if error_response:
+        return error_response
 
-    topic = data['topic']
-    model_key = data.get("model", DEFAULT_MODEL)
-    model_id = SUPPORTED_MODELS.get(model_key)
-    if not model_id:
-        return jsonify({"status": "error", "message": f"Model '{model_key}' not supported."}), 400
+    cache_key = topic_cache_key(topic, model_key)
+    cached_response, cache_status = get_cached_report(topic, model_key, cache_key)
+    if cached_response:
+        print(f"✅ Returning cached report for topic: '{topic}'")
+        return jsonify(with_cache_status(cached_response, cache_status)), 200
 
-    try:
-        article_text = get_article_content(topic)
-        system_prompt = ROLE_PROMPTS["osint_analyst"]
-        user_message = f"Here is the topic for analysis: '{topic}'.\n\nHere are the source articles I have retrieved:\n{article_text}"
-        report = call_ai_agent(model_id, system_prompt, user_message)
-        
-        with get_db_connection() as conn:
-            add_log_entry(conn, f"OSINT Analysis on: {topic}", report)
+    def compute():
+        article_text = prepare_evidence(topic, model_id)
+        report = call_ai_agent(model_id, ROLE_PROMPTS["osint_analyst"], build_osint_message(topic, article_text))
+
+        add_log_entry("osint", f"OSINT Analysis on: {topic}", report)
+
+        response_data = {"status": "success", "topic": topic, "osint_report": report}
+        remember_semantic(OSINT_SEMANTIC_CACHE, topic, model_key, response_data)
+        return response_data
 
-        return jsonify({"status": "success", "osint_report": report}), 200
+    try:
+        response_data = OSINT_FLIGHTS.do(cache_key, compute)
+        return jsonify(with_cache_status(response_data, "recomputed")), 200
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@app.route("/analyze_topic/stream", methods=['POST'])
+def analyze_topic_stream():
+    """
+    Server-Sent Events version of /analyze_topic: 'evidence', then 'token' deltas of the
+    report as the model produces them, then 'done' with the usual JSON payload.
+    The full report is logged once the stream has finished.
+    """
+    topic, model_key, model_id, error_response = parse_topic_request(get_json_from_request())
+    if error_response:
+        return error_response
+
+    cache_key = topic_cache_key(topic, model_key)
+    cached_response, cache_status = get_cached_report(topic, model_key, cache_key)
+
+    def generate():
+        if cached_response:
+            yield sse_event("done", with_cache_status(cached_response, cache_status))
+            return
+        try:
+            for event, payload in stream_osint_pipeline(topic, model_id):
+                if event == "done":
+                    add_log_entry("osint", f"OSINT Analysis on: {topic}", payload["osint_report"])
+                    OSINT_CACHE.set(cache_key, payload)
+                    remember_semantic(OSINT_SEMANTIC_CACHE, topic, model_key, payload)
+                    payload = with_cache_status(payload, "recomputed")
+                yield sse_event(event, payload)
+        except Exception as e:
+            yield sse_event("error", {"status": "error", "message": str(e)})
+
+    return sse_response(generate())
+
 @app.route("/run_debate", methods=['POST'])
 def run_debate():
+    topic, model_key, model_id, error_response = parse_topic_request(get_json_from_request())
+    if error_response:
+        return error_response
+
+    cache_key = topic_cache_key(topic, model_key)
+    cached_response, cache_status = get_cached_debate(topic, model_key, cache_key)
+    if cached_response:
+        print(f"✅ Returning {cache_status} cached result for topic: '{topic}'")
+        if cache_status == "stale":
+            schedule_refresh(DEBATE_FLIGHTS, cache_key, lambda: compute_debate(topic, model_key, model_id))
+        return jsonify(with_cache_status(cached_response, cache_status))
+
+    try:
+        response_data = DEBATE_FLIGHTS.do(cache_key, lambda: compute_debate(topic, model_key, model_id))
+        return jsonify(with_cache_status(response_data, "recomputed")), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@app.route("/run_debate/stream", methods=['POST'])
+def run_debate_stream():
+    """Server-Sent Events version of /run_debate: one event per stage, plus token deltas."""
+    topic, model_key, model_id, error_response = parse_topic_request(get_json_from_request())
+    if error_response:
+        return error_response
+
+    cache_key = topic_cache_key(topic, model_key)
+    cached_response, cache_status = get_cached_debate(topic, model_key, cache_key)
+    if cache_status == "stale":
+        schedule_refresh(DEBATE_FLIGHTS, cache_key, lambda: compute_debate(topic, model_key, model_id))
+
+    def generate():
+        if cached_response:
+            print(f"✅ Streaming {cache_status} cached result for topic: '{topic}'")
+            for event, payload in replay_debate(with_cache_status(cached_response, cache_status)):
+                yield sse_event(event, payload)
+            return
+        try:
+            for event, payload in stream_debate_pipeline(topic, model_id):
+                if event == "done":
+                    store_cached_debate(cache_key, payload)
+                    log_debate(topic, payload)
+                    remember_semantic(DEBATE_SEMANTIC_CACHE, topic, model_key, payload)
+                    print(f"✅ Stored new result in cache for topic: '{topic}'")
+                    payload = with_cache_status(payload, "recomputed")
+                yield sse_event(event, payload)
+        except Exception as e:
+            yield sse_event("error", {"status": "error", "message": str(e)})
+
+    return sse_response(generate())
+
+@app.route("/jobs", methods=['POST'])
+def submit_job():
+    """
+    Queues a debate or OSINT report and returns at once with a job id.
+    Body: {"kind": "debate" | "osint", "topic": ..., "model": ...}; poll GET /jobs/<job_id>.
+    """
     data = get_json_from_request()
-    if not data or 'topic' not in data:
-        return jsonify({"status": "error", "message": "Request body must be valid JSON and include 'topic'"}), 400
+    kind = (data or {}).get("kind", "debate")
+    runner = JOB_RUNNERS.get(kind)
+    if not runner:
+        return jsonify({"status": "error", "message": f"Job kind '{kind}' not supported."}), 400
 
-    topic = data['topic']
-    model_key = data.get("model", DEFAULT_MODEL)
-    model_id = SUPPORTED_MODELS.get(model_key)
-    if not model_id:
-        return jsonify({"status": "error", "message": f"Model '{model_key}' not supported."}), 400
+    topic, model_key, model_id, error_response = parse_topic_request(data)
+    if error_response:
+        return error_response
+
+    try:
+        job_id = JOBS.submit(kind, {"topic": topic, "model": model_key},
+                             lambda update: runner(topic, model_key, model_id, update))
+    except JobQueueFull as e:
+        return jsonify({"status": "error", "message": str(e)}), 503
 
-    cache_key = f"{topic}_{model_key}"
-    if cache_key in DEBATE_CACHE:
-        cached_data = DEBATE_CACHE[cache_key]
-        if datetime.now() < cached_data['timestamp'] + timedelta(minutes=CACHE_EXPIRATION_MINUTES):
-            print(f"✅ Returning cached result for topic: '{topic}'")
-            return jsonify(cached_data['response'])
+    return jsonify({"status": "success", "job_id": job_id, "job_status": "queued", "poll_url": f"/jobs/{job_id}"}), 202
 
+@app.route("/jobs/<job_id>", methods=['GET'])
+def get_job(job_id):
+    job = JOBS.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": f"Job '{job_id}' not found."}), 404
+    return jsonify({"status": "success", "job": job}), 200
+
+def build_fts_query(text):
+    """Quotes each term so user input can't break FTS5 syntax; terms are ANDed, a trailing * is a prefix match."""
+    terms = []
+    for term in text.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    return " ".join(terms)
+
+def parse_pagination(args, default_limit=20):
     try:
-        article_text = get_article_content(topic)
-        
-        debate_transcript = {}
-        debaters = {"tech_optimist": ROLE_PROMPTS["tech_optimist"], "ai_ethicist": ROLE_PROMPTS["ai_ethicist"]}
-        for role, system_prompt in debaters.items():
-            user_message = (f"Here is the content of relevant articles:\n{article_text}\n\n"
-                            f"Based on this evidence and your role as the {role.replace('_', ' ')}, "
-                            f"what is your opening statement on the topic of: '{topic}'?")
-            ai_response = call_ai_agent(model_id, system_prompt, user_message)
-            debate_transcript[role] = ai_response
-        
-        transcript_for_audit = f"Debate Topic: '{topic}'.\n\n"
-        for role, statement in debate_transcript.items():
-            transcript_for_audit += f"--- STATEMENT FROM: {role.replace('_', ' ').title()} ---\n{statement}\n\n"
-        audit_report = call_ai_agent(model_id, ROLE_PROMPTS["bias_auditor"], transcript_for_audit)
+        limit = int(args.get("limit", default_limit))
+        offset = int(args.get("offset", 0))
+    except ValueError:
+        return None, None, "'limit' and 'offset' must be integers."
+    if limit < 1 or offset < 0:
+        return None, None, "'limit' must be positive and 'offset' must not be negative."
+    return min(limit, LOG_SEARCH_MAX_LIMIT), offset, None
 
-        text_for_moderator = (f"DEBATE TRANSCRIPT:\n{transcript_for_audit}\n\nBIAS AUDIT REPORT:\n{audit_report}")
-        final_synthesis = call_ai_agent(model_id, ROLE_PROMPTS["moderator"], text_for_moderator)
-        
-        response_data = {
-            "status": "success",
-            "debate_transcript": debate_transcript,
-            "audit_report": audit_report,
-            "final_synthesis": final_synthesis
-        }
-        DEBATE_CACHE[cache_key] = {"timestamp": datetime.now(), "response": response_data}
-        print(f"✅ Stored new result in cache for topic: '{topic}'")
+def encode_log_cursor(timestamp, log_id):
+    return base64.urlsafe_b64encode(json.dumps([timestamp, log_id]).encode()).decode()
 
-        return jsonify(response_data), 200
-    except Exception as e:
+def decode_log_cursor(cursor):
+    try:
+        timestamp, log_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(timestamp), int(log_id)
+    except (ValueError, TypeError):
+        return None
+
+def parse_log_filters(args):
+    """Turns /logs query params into SQL WHERE clauses. Returns (clauses, params, error_message)."""
+    clauses, params = [], []
+    kind = args.get("kind")
+    if kind:
+        if kind not in LOG_KINDS:
+            return None, None, f"'kind' must be one of: {', '.join(LOG_KINDS)}."
+        clauses.append("kind = ?")
+        params.append(kind)
+    for name, operator in (("since", ">="), ("until", "<")):
+        value = args.get(name)
+        if value:
+            try:
+                value = datetime.fromisoformat(value).isoformat()
+            except ValueError:
+                return None, None, f"'{name}' must be an ISO-8601 date or datetime."
+            clauses.append(f"timestamp {operator} ?")
+            params.append(value)
+    cursor = args.get("cursor")
+    if cursor:
+        position = decode_log_cursor(cursor)
+        if position is None:
+            return None, None, "Invalid 'cursor'."
+        clauses.append("(timestamp, id) < (?, ?)")
+        params.extend(position)
+    return clauses, params, None
+
+@app.route("/logs", methods=['GET'])
+def list_logs():
+    """
+    Conversation history, newest first, with keyset pagination on (timestamp, id): pass the
+    returned next_cursor back as 'cursor'. Query params: kind (osint|debate|other), since and
+    until (ISO-8601, until exclusive), limit, include_response=1 to include the full responses.
+    """
+    limit, _, error_message = parse_pagination(request.args)
+    if not error_message:
+        clauses, params, error_message = parse_log_filters(request.args)
+    if error_message:
+        return jsonify({"status": "error", "message": error_message}), 400
+
+    include_response = request.args.get("include_response") in ("1", "true")
+    columns = "id, timestamp, kind, user_message" + (", ai_response" if include_response else "")
+    where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+    with get_db_connection() as conn:
+        rows = conn.execute(
+            f"SELECT {columns} FROM conversation_logs {where} ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (*params, limit + 1)
+        ).fetchall()
+
+    logs = []
+    for row in rows[:limit]:
+        entry = {"id": row[0], "timestamp": row[1], "kind": row[2], "user_message": row[3]}
+        if include_response:
+            entry["ai_response"] = LOG_COMPRESSOR.decompress(row[4])
+        logs.append(entry)
+    next_cursor = encode_log_cursor(rows[limit - 1][1], rows[limit - 1][0]) if len(rows) > limit else None
+    return jsonify({"status": "success", "logs": logs, "next_cursor": next_cursor}), 200
+
+@app.route("/logs/<int:log_id>", methods=['GET'])
+def get_log(log_id):
+    with get_db_connection() as conn:
+        row = conn.execute(
+            "SELECT id, timestamp, kind, user_message, ai_response FROM conversation_logs WHERE id = ?", (log_id,)
+        ).fetchone()
+    if not row:
+        return jsonify({"status": "error", "message": f"Log entry {log_id} not found."}), 404
+    return jsonify({"status": "success", "log": {
+        "id": row[0], "timestamp": row[1], "kind": row[2], "user_message": row[3],
+        "ai_response": LOG_COMPRESSOR.decompress(row[4])
+    }}), 200
+
+@app.route("/logs/search", methods=['GET'])
+def search_logs():
+    """
+    Full-text search over past conversations, best matches first (bm25).
+    Query params: q (required), limit, offset, raw=1 to pass q through as FTS5 query syntax.
+    """
+    text = request.args.get("q", "").strip()
+    if not text:
+        return jsonify({"status": "error", "message": "Query parameter 'q' is required."}), 400
+    limit, offset, error_message = parse_pagination(request.args)
+    if error_message:
+        return jsonify({"status": "error", "message": error_message}), 400
+
+    raw = request.args.get("raw") in ("1", "true")
+    fts_query = text if raw else build_fts_query(text)
+    if not fts_query:
+        return jsonify({"status": "error", "message": "Query parameter 'q' has no searchable terms."}), 400
+    start = time.perf_counter()
+    try:
+        with get_db_connection() as conn:
+            # One extra row tells us whether there is a next page without a COUNT(*).
+            rows = conn.execute(SEARCH_LOGS, (fts_query, limit + 1, offset)).fetchall()
+            page = rows[:limit]
+            details = {row[0]: row for row in conn.execute(
+                SEARCH_LOG_SNIPPETS.format(placeholders=", ".join("?" * len(page))),
+                (fts_query, *(row[0] for row in page))
+            )} if page else {}
+    except sqlite3.OperationalError as e:
+        if raw:
+            return jsonify({"status": "error", "message": f"Invalid search query: {e}"}), 400
         return jsonify({"status": "error", "message": str(e)}), 500
 
+    results = [
+        {"id": log_id, "timestamp": details[log_id][1], "user_message": details[log_id][2],
+         "snippet": details[log_id][3], "score": round(-score, 4)}
+        for log_id, score in page if log_id in details
+    ]
+    return jsonify({
+        "status": "success",
+        "query": text,
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(rows) > limit else None,
+        "took_ms": round((time.perf_counter() - start) * 1000, 2)
+    }), 200
+
 # --- Main Execution Block ---
 if __name__ == "__main__":
     if not os.path.exists(DATABASE_FILE):
@@ -0,0 +1,470 @@
+# asgi.py
+# asyncio-native serving path. /analyze_topic and /run_debate run on the event loop with
+# aiohttp and AsyncInferenceClient, so a single worker can hold hundreds of in-flight
+# debates instead of one OS thread each. Every other route (and CORS preflight) is
+# handed to the Flask app on a thread pool (ASGI_WSGI_THREADS). The JSON contract is
+# the same as app.py's.
+#
+#   uvicorn asgi:app --port 5000
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+from huggingface_hub import AsyncInferenceClient
+
+import app as atlas
+from cache import normalize_topic
+from extract import extract_text
+
+ASGI_HTTP_POOL_LIMIT = int(os.getenv("ASGI_HTTP_POOL_LIMIT", "200"))
+ASGI_HTTP_POOL_LIMIT_PER_HOST = int(os.getenv("ASGI_HTTP_POOL_LIMIT_PER_HOST", "50"))
+# Threads for the Flask routes; each open SSE stream holds one for its whole duration.
+ASGI_WSGI_THREADS = int(os.getenv("ASGI_WSGI_THREADS", "64"))
+
+_http_session = None
+# Bounded by SUPPORTED_MODELS x HF_TOKEN_n, so a plain dict is enough here.
+_async_clients = {}
+_refreshing_keys = set()
+_background_tasks = set()
+
+
+def get_http_session():
+    """Shared keep-alive aiohttp session for NewsAPI and the Jina reader."""
+    global _http_session
+    if _http_session is None or _http_session.closed:
+        connector = aiohttp.TCPConnector(limit=ASGI_HTTP_POOL_LIMIT, limit_per_host=ASGI_HTTP_POOL_LIMIT_PER_HOST)
+        _http_session = aiohttp.ClientSession(connector=connector)
+    return _http_session
+
+
+def get_async_client(model_id, token):
+    key = (model_id, token)
+    client = _async_clients.get(key)
+    if client is None:
+        client = _async_clients[key] = AsyncInferenceClient(model=model_id, token=token)
+    return client
+
+
+# --- LLM Calls ---
+def should_try_next_token(i, error):
+    """Async counterpart of atlas.handle_token_error for aiohttp errors."""
+    if error.status in [402, 429]:
+        print(f"⚠️ Token #{i + 1} failed: {error}. Trying next token.")
+        retry_after = error.headers.get("Retry-After") if error.headers else None
+        atlas.TOKEN_SCHEDULER.record_failure(i, error.status, retry_after)
+        return True
+    if error.status == 401:
+        print(f"⚠️ Token #{i + 1} was rejected: {error}. Discarding its clients.")
+        token = atlas.hf_tokens[i]
+        for key in [key for key in _async_clients if key[1] == token]:
+            del _async_clients[key]
+        atlas.INFERENCE_CLIENTS.discard_token(token)
+        atlas.TOKEN_SCHEDULER.record_failure(i, error.status)
+        return True
+    return False
+
+
+async def call_ai_agent(model_id, system_prompt, user_message, max_tokens=atlas.COMPLETION_MAX_TOKENS):
+    """Async call_ai_agent; shares the token scheduler with the threaded path."""
+    for i in atlas.TOKEN_SCHEDULER.ordered_tokens():
+        with atlas.TOKEN_SCHEDULER.lease(i):
+            try:
+                client = get_async_client(model_id, atlas.hf_tokens[i])
+                completion = await client.chat_completion(
+                    messages=atlas.build_messages(system_prompt, user_message),
+                    max_tokens=max_tokens,
+                )
+                atlas.TOKEN_SCHEDULER.record_success(i)
+                return atlas.extract_completion_text(completion)
+            except aiohttp.ClientResponseError as e:
+                if should_try_next_token(i, e):
+                    continue
+                raise e
+    raise Exception("All available API tokens have failed.")
+
+
+# --- Evidence Gathering ---
+async def fetch_cached(cache, key, url, headers, timeout, parse):
+    """Async counterpart of atlas.fetch_cached, backed by the same disk caches."""
+    entry = await asyncio.to_thread(cache.get_entry, key)
+    if entry and not entry["stale"]:
+        atlas.EVIDENCE_LOOKUPS.record(f"{cache.namespace}_hit")
+        return entry["value"]["data"]
+
+    request_headers = dict(headers)
+    if entry:
+        if entry["value"].get("etag"):
+            request_headers["If-None-Match"] = entry["value"]["etag"]
+        if entry["value"].get("last_modified"):
+            request_headers["If-Modified-Since"] = entry["value"]["last_modified"]
+
+    async with get_http_session().get(url, headers=request_headers,
+                                      timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+        if response.status == 304 and entry:
+            atlas.EVIDENCE_LOOKUPS.record(f"{cache.namespace}_revalidated")
+            await asyncio.to_thread(cache.set, key, entry["value"])
+            return entry["value"]["data"]
+        response.raise_for_status()
+        data = await parse(response)
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+
+    atlas.EVIDENCE_LOOKUPS.record(f"{cache.namespace}_miss")
+    await asyncio.to_thread(cache.set, key, dict(validators, data=data))
+    return data
+
+
+async def parse_articles(response):
+    return (await response.json()).get("articles", [])
+
+
+async def parse_article_text(response):
+    body = await response.text()
+    return await asyncio.to_thread(extract_text, body, response.headers.get("Content-Type"), str(response.url))
+
+
+async def read_article(article, timeout):
+    url = article['url']
+    headers = {"Authorization": f"Bearer {atlas.jina_api_key}"}
+    try:
+        content = await fetch_cached(atlas.ARTICLE_CACHE, url, f"https://r.jina.ai/{url}", headers, timeout,
+                                     parse_article_text)
+        return atlas.format_article(article, content)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"Warning: Could not read URL {url}: {e}")
+        return None
+
+
+async def get_article_content(topic):
+    """Async get_article_content: same output, and stragglers are truly cancelled at the deadline."""
+    if not atlas.news_api_key or not atlas.jina_api_key:
+        print("⚠️ OSINT keys not found. Disabling evidence gathering.")
+        raise atlas.EvidenceUnavailable("OSINT evidence gathering is disabled due to missing API keys.")
+
+    print(f"Fetching and reading articles for topic: {topic}")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + atlas.EVIDENCE_DEADLINE_SECONDS
+    try:
+        articles = await fetch_cached(atlas.NEWS_SEARCH_CACHE, normalize_topic(topic), atlas.news_search_url(topic),
+                                      {}, min(atlas.READER_TIMEOUT_SECONDS, atlas.EVIDENCE_DEADLINE_SECONDS),
+                                      parse_articles)
+        if not articles:
+            raise atlas.EvidenceUnavailable("No relevant articles found.")
+
+        reader_timeout = max(0.1, min(atlas.READER_TIMEOUT_SECONDS, deadline - loop.time()))
+        tasks = [asyncio.create_task(read_article(article, reader_timeout)) for article in articles]
+        done, pending = await asyncio.wait(tasks, timeout=max(0, deadline - loop.time()))
+        if pending:
+            print(f"⏱️ {len(pending)} article(s) missed the {atlas.EVIDENCE_DEADLINE_SECONDS}s evidence deadline.")
+            for task in pending:
+                task.cancel()
+
+        full_text = "".join(task.result() or "" for task in tasks if task in done)
+        if not full_text:
+            print("⚠️ Web Reader failed. Falling back to using headlines only.")
+            raise atlas.EvidenceUnavailable(
+                f"Here is a summary of recent news headlines:\n{atlas.format_headlines(articles)}")
+        return full_text
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        print(f"❌ Could not fetch news headlines: {e}")
+        raise atlas.EvidenceUnavailable("Could not retrieve any news articles.")
+
+
+async def summarize_evidence(topic, article_text):
+    if atlas.EVIDENCE_BRIEF_MODE == "llm":
+        model_id = atlas.SUPPORTED_MODELS[atlas.EVIDENCE_BRIEF_MODEL]
+        packed_text = await asyncio.to_thread(atlas.pack_evidence_for_model, article_text, topic, model_id)
+        try:
+            return await call_ai_agent(model_id, atlas.ROLE_PROMPTS["evidence_summarizer"],
+                                       atlas.build_brief_message(topic, packed_text),
+                                       max_tokens=atlas.EVIDENCE_BRIEF_TOKENS)
+        except Exception as e:
+            print(f"⚠️ LLM evidence brief failed ({e}); using an extractive brief instead.")
+    return await asyncio.to_thread(atlas.extractive_brief, article_text, topic, atlas.EVIDENCE_BRIEF_TOKENS)
+
+
+async def prepare_evidence(topic, model_id):
+    """Async atlas.prepare_evidence; shares the evidence brief cache with the threaded path."""
+    async def compute():
+        return await summarize_evidence(topic, await get_article_content(topic))
+
+    try:
+        if atlas.EVIDENCE_BRIEF_MODE == "off":
+            article_text = await get_article_content(topic)
+            return await asyncio.to_thread(atlas.pack_evidence_for_model, article_text, topic, model_id)
+
+        cache_key = atlas.evidence_brief_key(topic)
+        brief = await asyncio.to_thread(atlas.EVIDENCE_BRIEF_CACHE.get, cache_key)
+        if brief is not None:
+            print(f"♻️ Reusing cached evidence brief for topic: '{topic}'")
+            return brief
+        return await EVIDENCE_BRIEF_FLIGHTS.do(cache_key, compute)
+    except atlas.EvidenceUnavailable as e:
+        return await asyncio.to_thread(atlas.pack_evidence_for_model, str(e), topic, model_id)
+
+
+# --- Pipelines ---
+async def run_debate_pipeline(topic, model_id):
+    """Async run_debate_pipeline; same payload, including per-stage timings."""
+    timings = {}
+    pipeline_start = time.perf_counter()
+
+    stage_start = time.perf_counter()
+    article_text = await prepare_evidence(topic, model_id)
+    timings["evidence"] = atlas._elapsed(stage_start)
+
+    stage_start = time.perf_counter()
+    statements = await asyncio.gather(*(
+        call_ai_agent(model_id, atlas.ROLE_PROMPTS[role], atlas.build_debater_message(role, topic, article_text))
+        for role in atlas.DEBATER_ROLES
+    ))
+    debate_transcript = dict(zip(atlas.DEBATER_ROLES, statements))
+    timings["debaters"] = atlas._elapsed(stage_start)
+
+    stage_start = time.perf_counter()
+    transcript_for_audit = atlas.build_audit_transcript(topic, debate_transcript)
+    audit_report = await call_ai_agent(model_id, atlas.ROLE_PROMPTS["bias_auditor"], transcript_for_audit)
+    timings["audit"] = atlas._elapsed(stage_start)
+
+    stage_start = time.perf_counter()
+    text_for_moderator = atlas.build_moderator_message(transcript_for_audit, audit_report)
+    final_synthesis = await call_ai_agent(model_id, atlas.ROLE_PROMPTS["moderator"], text_for_moderator)
+    timings["synthesis"] = atlas._elapsed(stage_start)
+    timings["total"] = atlas._elapsed(pipeline_start)
+
+    return {
+        "status": "success",
+        "topic": topic,
+        "debate_transcript": debate_transcript,
+        "audit_report": audit_report,
+        "final_synthesis": final_synthesis,
+        "timings": timings
+    }
+
+
+class AsyncSingleFlight:
+    """
+    Event-loop version of cache.SingleFlight: concurrent requests for a key await one
+    computation, and the shared cache's lease keeps other workers from duplicating it.
+    """
+
+    def __init__(self, flights):
+        self.cache = flights.cache
+        self.lease_seconds = flights.lease_seconds
+        self.poll_interval = flights.poll_interval
+        self._flights = {}
+
+    async def do(self, key, compute):
+        while key in self._flights:
+            flight = self._flights[key]
+            try:
+                return await asyncio.shield(flight)
+            except asyncio.CancelledError:
+                if not flight.cancelled():
+                    raise  # This waiter itself was cancelled.
+                # The leader was cancelled (e.g. its client disconnected); take over or join the next flight.
+
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            value = await self._compute_once(key, compute)
+            flight.set_result(value)
+            return value
+        except Exception as e:
+            flight.set_exception(e)
+            flight.exception()  # Mark as retrieved when nobody else was waiting.
+            raise
+        finally:
+            if not flight.done():
+                flight.cancel()
+            del self._flights[key]
+
+    async def _compute_once(self, key, compute):
+        if not hasattr(self.cache, "acquire_lease"):
+            value = await compute()
+            await asyncio.to_thread(self.cache.set, key, value)
+            return value
+
+        owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        while not await asyncio.to_thread(self.cache.acquire_lease, key, owner, self.lease_seconds):
+            while await asyncio.to_thread(self.cache.lease_active, key):
+                await asyncio.sleep(self.poll_interval)
+                value = await asyncio.to_thread(self.cache.get, key)
+                if value is not None:
+                    return value
+            value = await asyncio.to_thread(self.cache.get, key)
+            if value is not None:
+                return value
+        try:
+            value = await asyncio.to_thread(self.cache.get, key)
+            if value is None:
+                value = await compute()
+                await asyncio.to_thread(self.cache.set, key, value)
+            return value
+        finally:
+            await asyncio.to_thread(self.cache.release_lease, key, owner)
+
+
+DEBATE_FLIGHTS = AsyncSingleFlight(atlas.DEBATE_FLIGHTS)
+OSINT_FLIGHTS = AsyncSingleFlight(atlas.OSINT_FLIGHTS)
+EVIDENCE_BRIEF_FLIGHTS = AsyncSingleFlight(atlas.EVIDENCE_BRIEF_FLIGHTS)
+
+
+def schedule_refresh(flights, cache_key, compute):
+    """Recomputes a stale entry as a background task, at most one per key at a time."""
+    refresh_key = (flights.cache.name, cache_key)
+    if refresh_key in _refreshing_keys:
+        return
+    _refreshing_keys.add(refresh_key)
+
+    async def refresh():
+        try:
+            await flights.do(cache_key, compute)
+            print(f"🔄 Refreshed stale cache entry: '{cache_key}'")
+        except Exception as e:
+            print(f"⚠️ Background refresh failed for '{cache_key}': {e}")
+        finally:
+            _refreshing_keys.discard(refresh_key)
+
+    task = asyncio.create_task(refresh())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+# --- Endpoints ---
+async def analyze_topic(data):
+    topic, model_key, model_id, error_message = atlas.validate_topic_request(data)
+    if error_message:
+        return 400, {"status": "error", "message": error_message}
+
+    cache_key = atlas.topic_cache_key(topic, model_key)
+    cached_response, cache_status = await asyncio.to_thread(atlas.get_cached_report, topic, model_key, cache_key)
+    if cached_response:
+        print(f"✅ Returning cached report for topic: '{topic}'")
+        return 200, atlas.with_cache_status(cached_response, cache_status)
+
+    async def compute():
+        article_text = await prepare_evidence(topic, model_id)
+        report = await call_ai_agent(model_id, atlas.ROLE_PROMPTS["osint_analyst"],
+                                     atlas.build_osint_message(topic, article_text))
+
+        # Usually just a queue put; with LOG_WRITER_ENABLED off it is a blocking INSERT.
+        await asyncio.to_thread(atlas.add_log_entry, "osint", f"OSINT Analysis on: {topic}", report)
+
+        response_data = {"status": "success", "topic": topic, "osint_report": report}
+        atlas.remember_semantic(atlas.OSINT_SEMANTIC_CACHE, topic, model_key, response_data)
+        return response_data
+
+    response_data = await OSINT_FLIGHTS.do(cache_key, compute)
+    return 200, atlas.with_cache_status(response_data, "recomputed")
+
+
+async def run_debate(data):
+    topic, model_key, model_id, error_message = atlas.validate_topic_request(data)
+    if error_message:
+        return 400, {"status": "error", "message": error_message}
+
+    async def compute():
+        response_data = await run_debate_pipeline(topic, model_id)
+        await asyncio.to_thread(atlas.log_debate, topic, response_data)
+        atlas.remember_semantic(atlas.DEBATE_SEMANTIC_CACHE, topic, model_key, response_data)
+        print(f"✅ Storing new result in cache for topic: '{topic}'")
+        return response_data
+
+    cache_key = atlas.topic_cache_key(topic, model_key)
+    cached_response, cache_status = await asyncio.to_thread(atlas.get_cached_debate, topic, model_key, cache_key)
+    if cached_response:
+        print(f"✅ Returning {cache_status} cached result for topic: '{topic}'")
+        if cache_status == "stale":
+            schedule_refresh(DEBATE_FLIGHTS, cache_key, compute)
+        return 200, atlas.with_cache_status(cached_response, cache_status)
+
+    response_data = await DEBATE_FLIGHTS.do(cache_key, compute)
+    return 200, atlas.with_cache_status(response_data, "recomputed")
+
+
+ASYNC_ROUTES = {
+    "/analyze_topic": analyze_topic,
+    "/run_debate": run_debate
+}
+
+
+# --- ASGI Plumbing ---
+WSGI_EXECUTOR = ThreadPoolExecutor(max_workers=ASGI_WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+class ThreadPoolWsgiToAsgiInstance(WsgiToAsgiInstance):
+    # asgiref runs every WSGI request on one shared thread (thread_sensitive=True), so a single
+    # SSE stream would block every other Flask route; run them on a pool instead.
+    run_wsgi_app = sync_to_async(vars(WsgiToAsgiInstance)["run_wsgi_app"].func,
+                                 thread_sensitive=False, executor=WSGI_EXECUTOR)
+
+
+class ThreadPoolWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await ThreadPoolWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+flask_app = ThreadPoolWsgiToAsgi(atlas.app)
+
+
+async def read_json_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body)
+    except ValueError:
+        print(f"🚨 FAILED TO PARSE JSON. RAW REQUEST DATA:\n---\n{body.decode('utf-8', 'replace')}\n---")
+        return None
+
+
+async def send_json(send, status, payload):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"access-control-allow-origin", b"*")
+        ]
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            get_http_session()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            if _http_session is not None:
+                await _http_session.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+
+    handler = ASYNC_ROUTES.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+    if handler is None:
+        await flask_app(scope, receive, send)
+        return
+
+    data = await read_json_body(receive)
+    try:
+        status, payload = await handler(data)
+    except Exception as e:
+        status, payload = 500, {"status": "error", "message": str(e)}
+    await send_json(send, status, payload)
@@ -0,0 +1,473 @@
+# cache.py
+# Bounded, thread-safe result caches for the API endpoints.
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+import uuid
+from collections import OrderedDict
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "sqlite")
+CACHE_DB_FILE = os.getenv("CACHE_DB_FILE", "cache.db")
+SINGLE_FLIGHT_LEASE_SECONDS = int(os.getenv("SINGLE_FLIGHT_LEASE_SECONDS", "300"))
+CACHE_KEY_STRIP_STOPWORDS = os.getenv("CACHE_KEY_STRIP_STOPWORDS", "false").lower() in ("1", "true", "yes")
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "how", "in", "is", "it",
+    "of", "on", "or", "that", "the", "this", "to", "was", "what", "when", "where", "which",
+    "who", "why", "will", "with"
+}
+
+
+def normalize_topic(topic, strip_stopwords=CACHE_KEY_STRIP_STOPWORDS):
+    """
+    Canonical form of a topic for cache lookups: Unicode NFKC, case-folded, whitespace
+    collapsed and trailing "?!." dropped, so "AI Safety", "ai safety " and "AI  safety?" match.
+    Other punctuation and symbols are kept: "C++ vs Rust" and "C vs Rust" are different topics.
+    """
+    text = unicodedata.normalize("NFKC", topic).casefold()
+    text = "".join(" " if unicodedata.category(char)[0] in "ZC" else char for char in text)
+    words = text.rstrip("?!. ").split()
+    if strip_stopwords:
+        # Never strip a topic down to nothing.
+        words = [word for word in words if word not in STOP_WORDS] or words
+    return " ".join(words) or topic.strip().casefold()
+
+
+class LookupStats:
+    """Thread-safe counters for cache lookup outcomes (e.g. exact_hit / normalized_hit / miss)."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def record(self, outcome):
+        with self._lock:
+            self._counts[outcome] = self._counts.get(outcome, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+
+def estimate_size(value):
+    """Approximate in-memory cost of a cached JSON-like value, in bytes."""
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+class TTLCache:
+    """
+    LRU cache with a maximum entry count, a byte budget and per-entry TTL.
+    A daemon thread sweeps expired entries every `sweep_interval` seconds, so
+    entries that are never looked up again don't linger in memory. Expired entries
+    are kept for another `stale_seconds` so get_entry() can still hand them out.
+    """
+
+    def __init__(self, ttl_seconds, max_entries=256, max_bytes=32 * 1024 * 1024, sweep_interval=60, name="cache",
+                 stale_seconds=0):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = name
+        self._entries = OrderedDict()  # key -> (value, expires_at, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        self._stop = threading.Event()
+        if sweep_interval:
+            sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                       name=f"{name}-sweeper", daemon=True)
+            sweeper.start()
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    def get_entry(self, key):
+        """
+        Returns {"value": ..., "stale": bool} for a fresh entry, or for an expired one that
+        is still inside the `stale_seconds` window. Returns None otherwise.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at, _ = entry
+            now = time.monotonic()
+            if now >= expires_at + self.stale_seconds:
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            stale = now >= expires_at
+            if stale:
+                self.stale_hits += 1
+            else:
+                self.hits += 1
+            return {"value": value, "stale": stale}
+
+    def get(self, key):
+        """Returns the value only while it is fresh."""
+        entry = self.get_entry(key)
+        if entry is None or entry["stale"]:
+            return None
+        return entry["value"]
+
+    def set(self, key, value):
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            print(f"⚠️ {self.name}: value for '{key}' ({size} bytes) exceeds the byte budget; not cached.")
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def sweep(self):
+        """Drops every expired entry. Returns how many were removed."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._entries.items()
+                       if now >= expires_at + self.stale_seconds]
+            for key in expired:
+                self._remove(key)
+            self.expirations += len(expired)
+        return len(expired)
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.sweep()
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class SqliteCache:
+    """
+    TTL cache stored in a SQLite file, so every worker process on the node shares it
+    and entries survive restarts. Writes are single INSERT OR REPLACE transactions, so
+    readers never see a half-written entry. Same interface as TTLCache.
+    """
+
+    def __init__(self, ttl_seconds, namespace, path=CACHE_DB_FILE, max_entries=256,
+                 max_bytes=32 * 1024 * 1024, sweep_interval=60, stale_seconds=0):
+        self.ttl_seconds = ttl_seconds
+        self.stale_seconds = stale_seconds
+        self.namespace = namespace
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.name = namespace
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        with self._connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_expiry ON cache_entries (namespace, expires_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_leases (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+
+        self._stop = threading.Event()
+        if sweep_interval:
+            sweeper = threading.Thread(target=self._sweep_loop, args=(sweep_interval,),
+                                       name=f"{namespace}-sweeper", daemon=True)
+            sweeper.start()
+
+    def _connection(self):
+        # One connection per thread; WAL lets readers in other workers proceed during writes.
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def get_entry(self, key):
+        """
+        Returns {"value": ..., "stale": bool} for a fresh entry, or for an expired one that
+        is still inside the `stale_seconds` window. Returns None otherwise.
+        """
+        row = self._connection().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        now = time.time()
+        if row is None or now >= row[1] + self.stale_seconds:
+            self._count("misses")
+            return None
+        stale = now >= row[1]
+        self._count("stale_hits" if stale else "hits")
+        return {"value": json.loads(row[0]), "stale": stale}
+
+    def get(self, key):
+        """Returns the value only while it is fresh."""
+        entry = self.get_entry(key)
+        if entry is None or entry["stale"]:
+            return None
+        return entry["value"]
+
+    def set(self, key, value):
+        payload = json.dumps(value, default=str)
+        size = len(payload.encode("utf-8"))
+        if size > self.max_bytes:
+            print(f"⚠️ {self.name}: value for '{key}' ({size} bytes) exceeds the byte budget; not cached.")
+            return
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at, size) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, payload, time.time() + self.ttl_seconds, size)
+            )
+            self._enforce_limits(conn)
+
+    def _enforce_limits(self, conn):
+        """Evicts the entries closest to expiry until the namespace fits its limits."""
+        count, total = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = 0
+        for key, size in conn.execute(
+            "SELECT key, size FROM cache_entries WHERE namespace = ? ORDER BY expires_at",
+            (self.namespace,)
+        ).fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+            count -= 1
+            total -= size
+            evicted += 1
+        self._count("evictions", evicted)
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache_entries WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def acquire_lease(self, key, owner, lease_seconds):
+        """Claims the right to compute `key` across all workers. Returns True if we got it."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache_leases WHERE namespace = ? AND key = ? AND expires_at <= ?",
+                         (self.namespace, key, now))
+            return conn.execute(
+                "INSERT OR IGNORE INTO cache_leases (namespace, key, owner, expires_at) VALUES (?, ?, ?, ?)",
+                (self.namespace, key, owner, now + lease_seconds)
+            ).rowcount == 1
+
+    def lease_active(self, key):
+        row = self._connection().execute(
+            "SELECT expires_at FROM cache_leases WHERE namespace = ? AND key = ?",
+            (self.namespace, key)
+        ).fetchone()
+        return row is not None and time.time() < row[0]
+
+    def release_lease(self, key, owner):
+        with self._connection() as conn:
+            conn.execute("DELETE FROM cache_leases WHERE namespace = ? AND key = ? AND owner = ?",
+                         (self.namespace, key, owner))
+
+    def sweep(self):
+        """Drops every expired entry in this namespace. Returns how many were removed."""
+        with self._connection() as conn:
+            removed = conn.execute(
+                "DELETE FROM cache_entries WHERE namespace = ? AND expires_at <= ?",
+                (self.namespace, time.time() - self.stale_seconds)
+            ).rowcount
+        self._count("expirations", removed)
+        return removed
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.sweep()
+            except sqlite3.Error as e:
+                print(f"⚠️ {self.name}: cache sweep failed: {e}")
+
+    def close(self):
+        self._stop.set()
+
+    def stats(self):
+        count, total = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache_entries WHERE namespace = ?",
+            (self.namespace,)
+        ).fetchone()
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "path": self.path,
+                "entries": count,
+                "bytes": total,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent computations of the same cache key. The first caller computes
+    and stores the value in `cache`; concurrent callers in this process wait for it.
+    If the cache supports leases (SqliteCache), callers in other workers wait for the
+    leader's result to land in the shared cache instead of computing it again.
+    """
+
+    def __init__(self, cache, lease_seconds=SINGLE_FLIGHT_LEASE_SECONDS, poll_interval=0.5):
+        self.cache = cache
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._flights = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.remote_waits = 0
+
+    def do(self, key, compute):
+        """Returns the value for `key`, computing it at most once across concurrent callers."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                leader = True
+                self.leaders += 1
+            else:
+                leader = False
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = self._compute_once(key, compute)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _compute_once(self, key, compute):
+        if not hasattr(self.cache, "acquire_lease"):
+            value = compute()
+            self.cache.set(key, value)
+            return value
+
+        owner = f"{os.getpid()}-{uuid.uuid4().hex}"
+        while not self.cache.acquire_lease(key, owner, self.lease_seconds):
+            # Another worker is computing this key; wait for its result to be cached.
+            with self._lock:
+                self.remote_waits += 1
+            while self.cache.lease_active(key):
+                time.sleep(self.poll_interval)
+                value = self.cache.get(key)
+                if value is not None:
+                    return value
+            value = self.cache.get(key)
+            if value is not None:
+                return value
+            # The other worker gave up without a result; try to take over.
+        try:
+            value = self.cache.get(key)
+            if value is None:
+                value = compute()
+                self.cache.set(key, value)
+            return value
+        finally:
+            self.cache.release_lease(key, owner)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": len(self._flights),
+                "leaders": self.leaders,
+                "coalesced": self.coalesced,
+                "remote_waits": self.remote_waits
+            }
+
+
+def build_cache(namespace, ttl_seconds, max_entries, max_bytes, sweep_interval=60, stale_seconds=0):
+    """Creates a cache on the configured CACHE_BACKEND ('sqlite' shares it across workers)."""
+    if CACHE_BACKEND == "sqlite":
+        return SqliteCache(ttl_seconds, namespace, max_entries=max_entries, max_bytes=max_bytes,
+                           sweep_interval=sweep_interval, stale_seconds=stale_seconds)
+    if CACHE_BACKEND != "memory":
+        print(f"⚠️ Unknown CACHE_BACKEND '{CACHE_BACKEND}', falling back to memory.")
+    return TTLCache(ttl_seconds, max_entries=max_entries, max_bytes=max_bytes,
+                    sweep_interval=sweep_interval, name=namespace, stale_seconds=stale_seconds)
@@ -0,0 +1,178 @@
+# compression.py
+# Transparent compression of large conversation log bodies. Compressed values are stored as
+# BLOBs (codec byte + dictionary id + payload); anything stored as TEXT is plain, so small
+# and pre-existing rows need no special handling. Reports share most of their structure, so
+# a dictionary trained on past responses (zlib zdict, or zstd when installed) does most of the work.
+import os
+import threading
+import zlib
+from collections import Counter
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# "zlib" (default), "zstd" (needs the zstandard package) or "off" to store new bodies as text.
+LOG_COMPRESSION = os.getenv("LOG_COMPRESSION", "zlib").lower()
+LOG_COMPRESSION_MIN_BYTES = int(os.getenv("LOG_COMPRESSION_MIN_BYTES", "512"))
+LOG_COMPRESSION_LEVEL = int(os.getenv("LOG_COMPRESSION_LEVEL", "6"))
+LOG_DICTIONARY_BYTES = int(os.getenv("LOG_DICTIONARY_BYTES", str(32 * 1024)))
+LOG_DICTIONARY_SAMPLES = int(os.getenv("LOG_DICTIONARY_SAMPLES", "2000"))
+# Until this many entries exist, the dictionary is mostly SEED_PHRASES and is retrained at startup.
+LOG_DICTIONARY_MIN_SAMPLES = int(os.getenv("LOG_DICTIONARY_MIN_SAMPLES", "50"))
+if LOG_COMPRESSION == "zstd" and zstandard is None:
+    print("⚠️ LOG_COMPRESSION=zstd but the zstandard package is not installed; using zlib.")
+    LOG_COMPRESSION = "zlib"
+if LOG_COMPRESSION not in ("zlib", "zstd", "off"):
+    print(f"⚠️ Unknown LOG_COMPRESSION '{LOG_COMPRESSION}', falling back to zlib.")
+    LOG_COMPRESSION = "zlib"
+
+CODEC_IDS = {"zlib": 1, "zstd": 2}
+CODEC_NAMES = {codec_id: name for name, codec_id in CODEC_IDS.items()}
+HEADER_BYTES = 5
+
+# Boilerplate every report and debate log contains; seeds the dictionary before there is
+# enough history to learn from.
+SEED_PHRASES = (
+    "OSINT Analysis on: ", "Sources I Have Analyzed", "Author and Publication Credibility Assessment",
+    "Legitimacy of the Information", "Final Conclusion", "DEBATE TRANSCRIPT:\nDebate Topic: ",
+    "--- STATEMENT FROM: Tech Optimist ---\n", "--- STATEMENT FROM: Ai Ethicist ---\n",
+    "BIAS AUDIT REPORT:\n", "FINAL SYNTHESIS:\n", "artificial intelligence", "According to ",
+    "However, ", "In conclusion, ", " the ", " and ", " of the ", " that ", " is ", " to ", " in "
+)
+
+
+def train_dictionary(samples, size=LOG_DICTIONARY_BYTES, codec=None):
+    """
+    Builds a dictionary from sample responses. For zstd with enough samples this is zstd's own
+    trainer; otherwise it is the lines that recur across the most samples, most common last
+    (zlib matches nearer the end of the dictionary more cheaply), on top of SEED_PHRASES.
+    """
+    codec = codec or LOG_COMPRESSION
+    if codec == "zstd" and len(samples) >= 100:
+        try:
+            return zstandard.train_dictionary(size, [s.encode("utf-8") for s in samples]).as_bytes()
+        except zstandard.ZstdError as e:
+            print(f"⚠️ zstd dictionary training failed ({e}); using the line-frequency dictionary.")
+
+    counts = Counter()
+    for sample in samples:
+        counts.update({line.strip() for line in sample.splitlines() if len(line.strip()) >= 8})
+    common = [line for line, count in counts.most_common() if count > 1]
+
+    parts, used = [], sum(len(phrase.encode("utf-8")) for phrase in SEED_PHRASES)
+    for line in common:
+        encoded = (line + "\n").encode("utf-8")
+        if used + len(encoded) > size:
+            break
+        parts.append(encoded)
+        used += len(encoded)
+    return "".join(SEED_PHRASES).encode("utf-8") + b"".join(reversed(parts))
+
+
+class LogCompressor:
+    """
+    Compresses/decompresses log bodies with the dictionaries loaded from the database.
+    `loader(dictionary_id) -> (codec, data) or None` fetches dictionaries this process has
+    not seen yet, e.g. one another worker trained after this one started.
+    """
+
+    def __init__(self, codec=LOG_COMPRESSION, min_bytes=LOG_COMPRESSION_MIN_BYTES, level=LOG_COMPRESSION_LEVEL,
+                 loader=None):
+        self.codec = codec
+        self.min_bytes = min_bytes
+        self.level = level
+        self.loader = loader
+        self._dictionaries = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.decompressed = 0
+        self.dictionaries_loaded = 0
+
+    def add_dictionary(self, dictionary_id, codec, data):
+        with self._lock:
+            self._dictionaries[dictionary_id] = (codec, data)
+            if dictionary_id > self._active.get(codec, (0, None))[0]:
+                self._active[codec] = (dictionary_id, data)
+
+    def has_dictionary(self, codec):
+        with self._lock:
+            return codec in self._active
+
+    def _dictionary(self, dictionary_id):
+        with self._lock:
+            if dictionary_id not in self._dictionaries and self.loader is not None:
+                loaded = self.loader(dictionary_id)
+                if loaded is not None:
+                    # Only needed for decompression; the active dictionary stays the one chosen at startup.
+                    self._dictionaries[dictionary_id] = loaded
+                    self.dictionaries_loaded += 1
+            if dictionary_id not in self._dictionaries:
+                raise KeyError(f"Log compression dictionary {dictionary_id} does not exist.")
+            return self._dictionaries[dictionary_id][1]
+
+    def compress(self, text):
+        """Returns `text` unchanged if compression is off or it is small, else the compressed BLOB."""
+        raw = text.encode("utf-8")
+        if self.codec == "off" or len(raw) < self.min_bytes:
+            return text
+        with self._lock:
+            dictionary_id, dictionary = self._active.get(self.codec, (0, None))
+        if self.codec == "zstd":
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            payload = zstandard.ZstdCompressor(level=self.level, dict_data=dict_data).compress(raw)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 15, zdict=dictionary) if dictionary \
+                else zlib.compressobj(self.level)
+            payload = compressor.compress(raw) + compressor.flush()
+        if len(payload) + HEADER_BYTES >= len(raw):
+            return text
+        with self._lock:
+            self.compressed += 1
+            self.bytes_in += len(raw)
+            self.bytes_out += len(payload) + HEADER_BYTES
+        return bytes([CODEC_IDS[self.codec]]) + dictionary_id.to_bytes(4, "big") + payload
+
+    def decompress(self, value):
+        """Inverse of compress(); TEXT (and NULL) values are returned as they are."""
+        if not isinstance(value, bytes):
+            return value
+        codec = CODEC_NAMES.get(value[0])
+        dictionary_id = int.from_bytes(value[1:HEADER_BYTES], "big")
+        payload = value[HEADER_BYTES:]
+        dictionary = self._dictionary(dictionary_id) if dictionary_id else None
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("This log entry is zstd-compressed but the zstandard package is not installed.")
+            dict_data = zstandard.ZstdCompressionDict(dictionary) if dictionary else None
+            raw = zstandard.ZstdDecompressor(dict_data=dict_data).decompress(payload)
+        elif codec == "zlib":
+            decompressor = zlib.decompressobj(zdict=dictionary) if dictionary else zlib.decompressobj()
+            raw = decompressor.decompress(payload) + decompressor.flush()
+        else:
+            raise ValueError(f"Unknown log compression codec {value[0]}.")
+        with self._lock:
+            self.decompressed += 1
+        return raw.decode("utf-8")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "codec": self.codec,
+                "min_bytes": self.min_bytes,
+                "dictionaries": len(self._dictionaries),
+                "active_dictionary": self._active.get(self.codec, (None, None))[0],
+                "compressed": self.compressed,
+                "bytes_in": self.bytes_in,
+                "bytes_out": self.bytes_out,
+                "ratio": round(self.bytes_in / self.bytes_out, 2) if self.bytes_out else None,
+                "decompressed": self.decompressed,
+                "dictionaries_loaded": self.dictionaries_loaded
+            }
+
+
+LOG_COMPRESSOR = LogCompressor()
@@ -0,0 +1,499 @@
+# db.py
+# Per-process pool of SQLite connections to the conversation log database. Connections
+# are opened lazily, tuned once (WAL, pragmas, busy timeout) and reused across requests.
+# Log rows are written off the request path by a batching background writer.
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from compression import LOG_COMPRESSOR, LOG_DICTIONARY_MIN_SAMPLES, LOG_DICTIONARY_SAMPLES, train_dictionary
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "10"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").upper()
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "8192"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+LOG_WRITER_ENABLED = os.getenv("LOG_WRITER_ENABLED", "true").lower() in ("1", "true", "yes")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "1000"))
+LOG_BATCH_SIZE = int(os.getenv("LOG_BATCH_SIZE", "50"))
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "200"))
+# What to do when the queue is full: "block" waits up to LOG_ENQUEUE_TIMEOUT_SECONDS for
+# room (backpressure) and then drops the row; "drop" drops it immediately.
+LOG_QUEUE_FULL_POLICY = os.getenv("LOG_QUEUE_FULL_POLICY", "block").lower()
+LOG_ENQUEUE_TIMEOUT_SECONDS = float(os.getenv("LOG_ENQUEUE_TIMEOUT_SECONDS", "2"))
+if LOG_QUEUE_FULL_POLICY not in ("block", "drop"):
+    print(f"⚠️ Unknown LOG_QUEUE_FULL_POLICY '{LOG_QUEUE_FULL_POLICY}', falling back to block.")
+    LOG_QUEUE_FULL_POLICY = "block"
+if DB_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    print(f"⚠️ Unknown DB_SYNCHRONOUS '{DB_SYNCHRONOUS}', falling back to NORMAL.")
+    DB_SYNCHRONOUS = "NORMAL"
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within DB_POOL_TIMEOUT_SECONDS."""
+
+
+class ConnectionPool:
+    """
+    Bounded pool of sqlite3 connections. `connection()` is a context manager that commits on
+    success, rolls back on error and returns the connection to the pool either way. The pool
+    resets itself after a fork, so a gunicorn worker never reuses its parent's connections.
+    """
+
+    def __init__(self, path, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT_SECONDS):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._reset()
+        self.acquisitions = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.timeouts = 0
+        self.busy_errors = 0
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._in_use = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+        conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+        conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+        register_functions(conn)
+        return conn
+
+    def _acquire(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            self.acquisitions += 1
+            try:
+                conn = self._idle.get_nowait()
+                self._in_use += 1
+                return conn
+            except queue.Empty:
+                pass
+            if self._created < self.size:
+                self._created += 1
+                self._in_use += 1
+                create = True
+            else:
+                self.waits += 1
+                create = False
+
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                    self._in_use -= 1
+                raise
+
+        start = time.perf_counter()
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            with self._lock:
+                self.timeouts += 1
+            raise PoolTimeout(f"No database connection available within {self.timeout}s (pool size {self.size}).")
+        waited = time.perf_counter() - start
+        with self._lock:
+            self._in_use += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return conn
+
+    def _release(self, conn, pid):
+        with self._lock:
+            if pid != self._pid:
+                # Checked out before a fork/reset; it doesn't belong to this pool any more.
+                conn.close()
+                return
+            self._in_use -= 1
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        pid = self._pid
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except sqlite3.OperationalError as e:
+            if "locked" in str(e) or "busy" in str(e):
+                with self._lock:
+                    self.busy_errors += 1
+            conn.rollback()
+            raise
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._release(conn, pid)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "acquisitions": self.acquisitions,
+                "waits": self.waits,
+                "avg_wait_ms": round(self.wait_seconds * 1000 / self.waits, 2) if self.waits else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 2),
+                "timeouts": self.timeouts,
+                "busy_errors": self.busy_errors,
+                "busy_timeout_ms": DB_BUSY_TIMEOUT_MS,
+                "synchronous": DB_SYNCHRONOUS
+            }
+
+
+class LogWriter:
+    """
+    Background writer for INSERT-only rows. `write(params)` enqueues a row and returns at
+    once; a daemon thread inserts queued rows with executemany, one transaction per batch of
+    up to `batch_size` rows or every `flush_interval_ms`. Remaining rows are flushed at exit.
+    """
+
+    def __init__(self, pool, sql, batch_size=LOG_BATCH_SIZE, flush_interval_ms=LOG_FLUSH_INTERVAL_MS,
+                 max_queue_size=LOG_QUEUE_SIZE, policy=LOG_QUEUE_FULL_POLICY,
+                 enqueue_timeout=LOG_ENQUEUE_TIMEOUT_SECONDS):
+        self.pool = pool
+        self.sql = sql
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.policy = policy
+        self.enqueue_timeout = enqueue_timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.enqueued = 0
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+        self.blocked = 0
+        self.max_batch = 0
+        atexit.register(self.close)
+
+    def _ensure_thread(self):
+        # Started lazily (and again after a fork) so each worker process has its own writer.
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def write(self, params):
+        """Queues one row. Returns False if it was dropped because the queue stayed full."""
+        if self._closed:
+            self._insert([params])
+            return True
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(params)
+        except queue.Full:
+            try:
+                if self.policy != "block":
+                    raise
+                with self._lock:
+                    self.blocked += 1
+                self._queue.put(params, timeout=self.enqueue_timeout)
+            except queue.Full:
+                with self._lock:
+                    self.dropped += 1
+                print(f"⚠️ Log queue is full ({self._queue.maxsize} rows); dropping a log entry.")
+                return False
+        with self._lock:
+            self.enqueued += 1
+        return True
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, rows):
+        try:
+            with self.pool.connection() as conn:
+                conn.executemany(self.sql, rows)
+            with self._lock:
+                self.written += len(rows)
+                self.batches += 1
+                self.max_batch = max(self.max_batch, len(rows))
+        except Exception as e:
+            with self._lock:
+                self.failed += len(rows)
+            print(f"❌ Could not write {len(rows)} log entries: {e}")
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            stop = None in batch
+            rows = [row for row in batch if row is not None]
+            if rows:
+                self._insert(rows)
+            for _ in batch:
+                self._queue.task_done()
+            if stop:
+                return
+
+    def flush(self):
+        """Blocks until every row queued so far has been written (or has failed)."""
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        """Flushes and stops the writer; later writes go straight to the database."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue_size": self._queue.maxsize,
+                "batch_size": self.batch_size,
+                "flush_interval_ms": int(self.flush_interval * 1000),
+                "policy": self.policy,
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "batches": self.batches,
+                "max_batch": self.max_batch,
+                "blocked": self.blocked,
+                "dropped": self.dropped,
+                "failed": self.failed
+            }
+
+
+def dictionary_loader(path):
+    """
+    Returns a LogCompressor loader that reads one dictionary from `path`. It uses its own
+    short-lived connection because it can run inside log_text(), i.e. mid-statement (even
+    from an FTS trigger) on a connection that may hold the write lock.
+    """
+    def load(dictionary_id):
+        conn = sqlite3.connect(path, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+        try:
+            return conn.execute(
+                "SELECT codec, data FROM compression_dictionaries WHERE id = ?", (dictionary_id,)
+            ).fetchone()
+        except sqlite3.OperationalError:
+            return None
+        finally:
+            conn.close()
+    return load
+
+
+def register_functions(conn, compressor=LOG_COMPRESSOR):
+    """SQL helpers the log schema relies on; must be registered on every connection that writes logs."""
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if compressor.loader is None and path:
+        compressor.loader = dictionary_loader(path)
+    conn.create_function("log_text", 1, compressor.decompress, deterministic=True)
+
+
+# --- Log Schema Migrations ---
+# Applied in order and tracked with PRAGMA user_version, so each runs once per database.
+# They are written to be idempotent too, since databases from before versioning have
+# some of these objects already.
+LOG_FTS_TRIGGERS = (
+    """
+    CREATE TRIGGER IF NOT EXISTS conversation_logs_fts_insert AFTER INSERT ON conversation_logs BEGIN
+        INSERT INTO conversation_logs_fts (rowid, user_message, ai_response)
+        VALUES (new.id, new.user_message, log_text(new.ai_response));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversation_logs_fts_delete AFTER DELETE ON conversation_logs BEGIN
+        INSERT INTO conversation_logs_fts (conversation_logs_fts, rowid, user_message, ai_response)
+        VALUES ('delete', old.id, old.user_message, log_text(old.ai_response));
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS conversation_logs_fts_update
+    AFTER UPDATE OF user_message, ai_response ON conversation_logs BEGIN
+        INSERT INTO conversation_logs_fts (conversation_logs_fts, rowid, user_message, ai_response)
+        VALUES ('delete', old.id, old.user_message, log_text(old.ai_response));
+        INSERT INTO conversation_logs_fts (rowid, user_message, ai_response)
+        VALUES (new.id, new.user_message, log_text(new.ai_response));
+    END
+    """
+)
+
+
+def _table_exists(conn, name):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone() is not None
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _add_full_text_index(conn, content="conversation_logs"):
+    # External-content FTS5 index: the text lives only in `content`, and the triggers
+    # keep the index in step with every INSERT, UPDATE and DELETE on conversation_logs.
+    if not _table_exists(conn, "conversation_logs_fts"):
+        conn.execute(f"""
+            CREATE VIRTUAL TABLE conversation_logs_fts USING fts5(
+                user_message, ai_response,
+                content='{content}', content_rowid='id',
+                tokenize='porter unicode61'
+            )
+        """)
+        conn.execute("INSERT INTO conversation_logs_fts (conversation_logs_fts) VALUES ('rebuild')")
+        print("✅ Built the full-text index for conversation_logs.")
+    # Re-created so databases indexed before it was limited to the text columns pick up the
+    # narrower version; otherwise every metadata backfill would rewrite the whole index.
+    conn.execute("DROP TRIGGER IF EXISTS conversation_logs_fts_update")
+    for trigger in LOG_FTS_TRIGGERS:
+        conn.execute(trigger)
+
+
+def _add_kind_and_history_indexes(conn):
+    # Which endpoint produced the row ('osint', 'debate'; 'other' for anything unrecognised).
+    if "kind" not in _columns(conn, "conversation_logs"):
+        conn.execute("ALTER TABLE conversation_logs ADD COLUMN kind TEXT NOT NULL DEFAULT 'other'")
+        conn.execute("UPDATE conversation_logs SET kind = 'osint' WHERE user_message LIKE 'OSINT Analysis on:%'")
+        conn.execute("UPDATE conversation_logs SET kind = 'debate' WHERE user_message LIKE 'Debate on:%'")
+    # Both indexes end in the rowid, so (timestamp, id) keyset pages are pure index range scans.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_logs_timestamp ON conversation_logs (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_conversation_logs_kind_timestamp ON conversation_logs (kind, timestamp)")
+
+
+def _ensure_log_dictionary(conn):
+    # Caller holds a write transaction, so concurrent workers train at most one dictionary.
+    # Old dictionaries are never deleted: rows compressed with them still need them.
+    for dictionary_id, codec, data in conn.execute("SELECT id, codec, data FROM compression_dictionaries ORDER BY id"):
+        LOG_COMPRESSOR.add_dictionary(dictionary_id, codec, data)
+    if LOG_COMPRESSOR.codec == "off":
+        return
+    active = conn.execute(
+        "SELECT samples FROM compression_dictionaries WHERE codec = ? ORDER BY id DESC LIMIT 1", (LOG_COMPRESSOR.codec,)
+    ).fetchone()
+    if active and active[0] >= LOG_DICTIONARY_MIN_SAMPLES:
+        return
+    samples = [row[0] for row in conn.execute(
+        "SELECT log_text(ai_response) FROM conversation_logs ORDER BY id DESC LIMIT ?", (LOG_DICTIONARY_SAMPLES,)
+    )]
+    # A dictionary trained on too little history is replaced once enough has accumulated.
+    if active and len(samples) < LOG_DICTIONARY_MIN_SAMPLES:
+        return
+    data = train_dictionary(samples)
+    cursor = conn.execute(
+        "INSERT INTO compression_dictionaries (codec, data, samples, created_at) VALUES (?, ?, ?, ?)",
+        (LOG_COMPRESSOR.codec, data, len(samples), datetime.now().isoformat())
+    )
+    LOG_COMPRESSOR.add_dictionary(cursor.lastrowid, LOG_COMPRESSOR.codec, data)
+    print(f"✅ Trained a {len(data)}-byte {LOG_COMPRESSOR.codec} dictionary from {len(samples)} log entries.")
+
+
+def _compress_responses(conn, batch_size=500):
+    # Once bodies can be BLOBs the FTS index must read them through log_text(), so it is
+    # rebuilt on top of a decompressing view instead of the table itself.
+    for name in ("insert", "delete", "update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS conversation_logs_fts_{name}")
+    conn.execute("DROP TABLE IF EXISTS conversation_logs_fts")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS compression_dictionaries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            codec TEXT NOT NULL,
+            data BLOB NOT NULL,
+            samples INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    """)
+    _ensure_log_dictionary(conn)
+
+    compressed, last_id = 0, 0
+    while LOG_COMPRESSOR.codec != "off":
+        rows = conn.execute(
+            "SELECT id, ai_response FROM conversation_logs "
+            "WHERE id > ? AND typeof(ai_response) = 'text' AND length(ai_response) >= ? ORDER BY id LIMIT ?",
+            (last_id, LOG_COMPRESSOR.min_bytes, batch_size)
+        ).fetchall()
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        updates = [(value, log_id) for log_id, value in
+                   ((log_id, LOG_COMPRESSOR.compress(text)) for log_id, text in rows) if isinstance(value, bytes)]
+        conn.executemany("UPDATE conversation_logs SET ai_response = ? WHERE id = ?", updates)
+        compressed += len(updates)
+    if compressed:
+        print(f"✅ Compressed {compressed} existing log entries; run VACUUM to reclaim the freed space.")
+
+    conn.execute("""
+        CREATE VIEW IF NOT EXISTS conversation_logs_text AS
+        SELECT id, user_message, log_text(ai_response) AS ai_response FROM conversation_logs
+    """)
+    _add_full_text_index(conn, content="conversation_logs_text")
+
+
+LOG_MIGRATIONS = (
+    _add_full_text_index,
+    _add_kind_and_history_indexes,
+    _compress_responses
+)
+
+
+def migrate_log_schema(conn):
+    """
+    Brings conversation_logs up to the latest schema version. Each pending migration runs
+    in its own BEGIN IMMEDIATE transaction, so concurrent workers apply it exactly once.
+    """
+    if not _table_exists(conn, "conversation_logs"):
+        print("⚠️ conversation_logs does not exist yet; run 'python init_db.py'. Skipping migrations.")
+        return
+    register_functions(conn)
+    for version, migration in enumerate(LOG_MIGRATIONS, start=1):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                migration(conn)
+                conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def load_log_dictionaries(conn):
+    """Loads the compression dictionaries (training the first one for the codec if needed)."""
+    if not _table_exists(conn, "compression_dictionaries"):
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        _ensure_log_dictionary(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
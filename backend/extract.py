@@ -0,0 +1,172 @@
+# extract.py
+# Turns reader output into plain evidence text. Jina's reader usually returns markdown/text,
+# which is only cleaned up; real HTML goes through the fastest parser that is installed
+# (selectolax, then lxml, then BeautifulSoup's html.parser as the always-available fallback).
+import os
+import re
+import threading
+import time
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# "auto" picks the fastest available parser; "selectolax", "lxml" or "bs4" force one.
+TEXT_EXTRACTOR = os.getenv("TEXT_EXTRACTOR", "auto").lower()
+
+BOILERPLATE_TAGS = ("script", "style", "noscript", "template", "svg", "iframe", "form",
+                    "nav", "header", "footer", "aside", "button")
+
+# Elements that start a new line; inline ones (a, b, em, span...) stay part of their sentence.
+BLOCK_TAGS = ("address", "article", "blockquote", "br", "caption", "dd", "details", "div", "dl", "dt",
+              "figcaption", "figure", "h1", "h2", "h3", "h4", "h5", "h6", "hr", "li", "main", "ol", "p",
+              "pre", "section", "summary", "table", "td", "th", "tr", "ul")
+
+MARKDOWN_IMAGE_LINE = re.compile(r"^!\[[^\]]*\]\([^)]*\)$")
+MARKDOWN_LINK_ONLY_LINE = re.compile(r"^(?:[*+-]\s+)?\[[^\]]*\]\([^)]*\)$")
+
+
+def is_html(body, content_type=None):
+    """Trusts the Content-Type header when there is one, otherwise sniffs the first bytes."""
+    if content_type:
+        media_type = content_type.split(";")[0].strip().lower()
+        return media_type in ("text/html", "application/xhtml+xml")
+    head = body[:1024].lstrip().lower()
+    return head.startswith(("<!doctype html", "<html")) or "<body" in head
+
+
+def clean_lines(lines, markdown=False):
+    """Strips whitespace and blank runs; for markdown, also image-only and link-only (nav) lines."""
+    cleaned = []
+    for line in lines:
+        line = " ".join(line.split())
+        if markdown and (MARKDOWN_IMAGE_LINE.match(line) or MARKDOWN_LINK_ONLY_LINE.match(line)):
+            continue
+        if line or (cleaned and cleaned[-1]):
+            cleaned.append(line)
+    return "\n".join(cleaned).strip()
+
+
+def _selectolax_text(html):
+    tree = HTMLParser(html)
+    tree.strip_tags(list(BOILERPLATE_TAGS))
+    root = tree.body or tree.root
+    if not root:
+        return ""
+    for node in root.css(",".join(BLOCK_TAGS)):
+        node.insert_before("\n")
+        node.insert_after("\n")
+    return root.text(separator="")
+
+
+def _lxml_text(html):
+    doc = lxml.html.document_fromstring(html)
+    etree.strip_elements(doc, etree.Comment, *BOILERPLATE_TAGS, with_tail=False)
+    for element in doc.iter(*BLOCK_TAGS):
+        element.text = "\n" + (element.text or "")
+        element.tail = "\n" + (element.tail or "")
+    return "".join(doc.itertext())
+
+
+def _bs4_text(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(BOILERPLATE_TAGS):
+        tag.decompose()
+    for tag in soup(BLOCK_TAGS):
+        tag.insert_before("\n")
+        tag.insert_after("\n")
+    return soup.get_text()
+
+
+def _available_parsers():
+    parsers = {"bs4": _bs4_text}
+    if lxml is not None:
+        parsers["lxml"] = _lxml_text
+    if HTMLParser is not None:
+        parsers["selectolax"] = _selectolax_text
+    return parsers
+
+
+def _pick_parser():
+    parsers = _available_parsers()
+    if TEXT_EXTRACTOR in parsers:
+        return TEXT_EXTRACTOR, parsers[TEXT_EXTRACTOR]
+    if TEXT_EXTRACTOR != "auto":
+        print(f"⚠️ TEXT_EXTRACTOR '{TEXT_EXTRACTOR}' is not available; picking the fastest installed parser.")
+    for name in ("selectolax", "lxml", "bs4"):
+        if name in parsers:
+            return name, parsers[name]
+
+
+HTML_PARSER_NAME, _html_parser = _pick_parser()
+
+
+class ExtractionStats:
+    """Per-method counts and timings for /stats."""
+
+    def __init__(self):
+        self._methods = {}
+        self._lock = threading.Lock()
+
+    def record(self, method, elapsed_ms, chars_in, chars_out):
+        with self._lock:
+            stats = self._methods.setdefault(method, {
+                "articles": 0, "total_ms": 0.0, "max_ms": 0.0, "chars_in": 0, "chars_out": 0
+            })
+            stats["articles"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["chars_in"] += chars_in
+            stats["chars_out"] += chars_out
+
+    def stats(self):
+        with self._lock:
+            methods = {
+                method: dict(stats,
+                             total_ms=round(stats["total_ms"], 2),
+                             max_ms=round(stats["max_ms"], 2),
+                             avg_ms=round(stats["total_ms"] / stats["articles"], 2))
+                for method, stats in self._methods.items()
+            }
+        return {"html_parser": HTML_PARSER_NAME, "methods": methods}
+
+
+EXTRACTION_STATS = ExtractionStats()
+
+
+def extract_text(body, content_type=None, source=None):
+    """
+    Returns the readable text of a reader response. Plain text/markdown skips HTML parsing
+    entirely; HTML has boilerplate elements removed first. Timing is logged per article.
+    """
+    start = time.perf_counter()
+    if is_html(body, content_type):
+        method = HTML_PARSER_NAME
+        try:
+            html_text = _html_parser(body)
+        except Exception as e:
+            # e.g. lxml's "Document is empty" on a blank or comment-only page.
+            print(f"⚠️ {method} could not parse the page ({e}); falling back to bs4.")
+            method = "bs4"
+            try:
+                html_text = _bs4_text(body)
+            except Exception:
+                html_text = ""
+        text = clean_lines(html_text.splitlines())
+    else:
+        method = "text"
+        text = clean_lines(body.splitlines(), markdown=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    EXTRACTION_STATS.record(method, elapsed_ms, len(body), len(text))
+    print(f"🧹 Extracted {len(text)}/{len(body)} chars via {method} in {elapsed_ms:.1f}ms"
+          + (f": {source}" if source else ""))
+    return text
@@ -0,0 +1,118 @@
+# http_pool.py
+# Process-wide pooled HTTP sessions with keep-alive, so repeated calls to the
+# same host (newsapi.org, r.jina.ai, ...) reuse TCP+TLS connections.
+import os
+import threading
+import time
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+# --- Configurations ---
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "10"))
+# Per-host pool sizes, e.g. HTTP_POOL_HOSTS="r.jina.ai=16,newsapi.org=4"
+DEFAULT_POOL_HOSTS = "newsapi.org=4,r.jina.ai=12,router.huggingface.co=16"
+
+
+def _parse_host_sizes(raw):
+    sizes = {}
+    for item in raw.split(","):
+        if "=" not in item:
+            continue
+        host, size = item.split("=", 1)
+        try:
+            sizes[host.strip()] = int(size)
+        except ValueError:
+            print(f"⚠️ Ignoring invalid HTTP_POOL_HOSTS entry: '{item}'")
+    return sizes
+
+
+# Bytes per read while streaming a response body under a deadline.
+DEADLINE_READ_BYTES = int(os.getenv("DEADLINE_READ_BYTES", "16384"))
+
+HOST_POOL_SIZES = _parse_host_sizes(os.getenv("HTTP_POOL_HOSTS", DEFAULT_POOL_HOSTS))
+
+_session = None
+_adapters = {}
+_session_lock = threading.Lock()
+
+
+def _build_session():
+    session = requests.Session()
+    default_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount("https://", default_adapter)
+    session.mount("http://", default_adapter)
+    _adapters["*"] = default_adapter
+    for host, size in HOST_POOL_SIZES.items():
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+        session.mount(f"https://{host}/", adapter)
+        _adapters[host] = adapter
+    return session
+
+
+def get_http_session():
+    """
+    Returns the shared keep-alive session. requests' connection pools are thread-safe,
+    so one session is shared by every request thread in the process.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+def pool_stats():
+    """
+    Per-host pool counters. A 'miss' is a request that had to open a new connection,
+    a 'hit' is one served by a kept-alive connection from the pool.
+    """
+    stats = {}
+    for name, adapter in list(_adapters.items()):
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            host_stats = stats.setdefault(pool.host, {"requests": 0, "hits": 0, "misses": 0, "pool_maxsize": 0})
+            host_stats["requests"] += pool.num_requests
+            host_stats["misses"] += pool.num_connections
+            host_stats["hits"] += max(0, pool.num_requests - pool.num_connections)
+            host_stats["pool_maxsize"] = HOST_POOL_SIZES.get(name, HTTP_POOL_MAXSIZE)
+    return stats
+
+
+def read_before_deadline(response, deadline):
+    """
+    Reads the body of a stream=True response, closing it and raising requests' Timeout once
+    time.monotonic() passes `deadline`. requests' own timeout applies to each socket read,
+    so a slowly dripping body could otherwise hold the calling thread indefinitely.
+    Afterwards `response.content` / `.text` / `.json()` work as usual.
+    """
+    chunks = []
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise requests.exceptions.Timeout(f"Deadline passed while reading {response.url}")
+            # Never let one read block past the deadline.
+            connection = response.raw.connection
+            if connection is not None and connection.sock is not None:
+                connection.sock.settimeout(remaining)
+            chunk = response.raw.read1(DEADLINE_READ_BYTES, decode_content=True)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    except urllib3.exceptions.ReadTimeoutError as e:
+        response.close()
+        raise requests.exceptions.Timeout(f"Deadline passed while reading {response.url}: {e}")
+    except urllib3.exceptions.HTTPError as e:
+        response.close()
+        raise requests.exceptions.ConnectionError(e)
+    except requests.exceptions.Timeout:
+        response.close()
+        raise
+    response._content = b"".join(chunks)
+    return response
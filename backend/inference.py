@@ -0,0 +1,178 @@
+# inference.py
+# Reusable Hugging Face InferenceClients, shared across requests and threads.
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from huggingface_hub import InferenceClient, configure_http_backend
+from http_pool import get_http_session
+
+HF_CLIENT_CACHE_SIZE = int(os.getenv("HF_CLIENT_CACHE_SIZE", "32"))
+TOKEN_FAILURE_WINDOW_SECONDS = int(os.getenv("TOKEN_FAILURE_WINDOW_SECONDS", "300"))
+# Cool-downs used when the API doesn't send a Retry-After header.
+TOKEN_COOLDOWN_SECONDS = {429: 60, 402: 900}
+
+# Every InferenceClient goes through huggingface_hub's get_session(); point it at our
+# pooled keep-alive session so all clients share one set of connections.
+configure_http_backend(backend_factory=get_http_session)
+
+
+class InferenceClientRegistry:
+    """Bounded LRU of InferenceClients keyed by (model_id, token)."""
+
+    def __init__(self, max_size=HF_CLIENT_CACHE_SIZE):
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_id, token):
+        key = (model_id, token)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                self.hits += 1
+                return client
+            self.misses += 1
+            client = InferenceClient(model=model_id, token=token)
+            self._clients[key] = client
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+            return client
+
+    def discard_token(self, token):
+        """Drops every client built with `token`, e.g. after it has been revoked."""
+        with self._lock:
+            for key in [key for key in self._clients if key[1] == token]:
+                del self._clients[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._clients),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions
+            }
+
+
+INFERENCE_CLIENTS = InferenceClientRegistry()
+
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (delta-seconds or HTTP date) into seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class TokenScheduler:
+    """
+    Tracks the health of each HF token (recent 402/429s, Retry-After cool-downs and
+    in-flight calls) and hands out tokens healthiest-first, spreading load across them.
+    Tokens are referred to by their index in the token list.
+    """
+
+    def __init__(self, token_count):
+        self._lock = threading.Lock()
+        self._state = [
+            {
+                "in_flight": 0,
+                "successes": 0,
+                "failures": 0,
+                "recent_failures": deque(),
+                "cooldown_until": 0.0,
+                "last_status": None,
+                "last_used": 0.0
+            }
+            for _ in range(token_count)
+        ]
+
+    def _prune(self, state, now):
+        failures = state["recent_failures"]
+        while failures and now - failures[0] > TOKEN_FAILURE_WINDOW_SECONDS:
+            failures.popleft()
+
+    def ordered_tokens(self):
+        """Token indices, best first. Cooling-down tokens go last, soonest-available first."""
+        now = time.monotonic()
+        with self._lock:
+            def score(index):
+                state = self._state[index]
+                self._prune(state, now)
+                cooling = state["cooldown_until"] > now
+                return (
+                    cooling,
+                    state["cooldown_until"] if cooling else 0.0,
+                    len(state["recent_failures"]),
+                    state["in_flight"],
+                    state["last_used"]
+                )
+            return sorted(range(len(self._state)), key=score)
+
+    @contextmanager
+    def lease(self, index):
+        with self._lock:
+            state = self._state[index]
+            state["in_flight"] += 1
+            state["last_used"] = time.monotonic()
+        try:
+            yield
+        finally:
+            with self._lock:
+                state["in_flight"] -= 1
+
+    def record_success(self, index):
+        with self._lock:
+            state = self._state[index]
+            state["successes"] += 1
+            state["last_status"] = 200
+
+    def record_failure(self, index, status_code, retry_after=None):
+        now = time.monotonic()
+        cooldown = parse_retry_after(retry_after)
+        if cooldown is None:
+            cooldown = TOKEN_COOLDOWN_SECONDS.get(status_code, 0)
+        with self._lock:
+            state = self._state[index]
+            state["failures"] += 1
+            state["recent_failures"].append(now)
+            state["last_status"] = status_code
+            state["cooldown_until"] = max(state["cooldown_until"], now + cooldown)
+            self._prune(state, now)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            result = {}
+            for index, state in enumerate(self._state):
+                self._prune(state, now)
+                cooldown_remaining = max(0.0, state["cooldown_until"] - now)
+                result[f"HF_TOKEN_{index + 1}"] = {
+                    "healthy": cooldown_remaining == 0,
+                    "in_flight": state["in_flight"],
+                    "successes": state["successes"],
+                    "failures": state["failures"],
+                    "recent_failures": len(state["recent_failures"]),
+                    "cooldown_remaining": round(cooldown_remaining, 1),
+                    "last_status": state["last_status"]
+                }
+            return result
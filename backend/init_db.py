@@ -1,5 +1,6 @@
 # init_db.py
 import sqlite3
+from db import migrate_log_schema
 
 # Connect to the database file (it will be created if it doesn't exist)
 conn = sqlite3.connect('database.db')
@@ -7,7 +8,7 @@ print("Database created or opened successfully.")
 
 # Create the table
 conn.execute('''
-CREATE TABLE conversation_logs (
+CREATE TABLE IF NOT EXISTS conversation_logs (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     timestamp TEXT NOT NULL,
     user_message TEXT NOT NULL,
@@ -16,5 +17,9 @@ CREATE TABLE conversation_logs (
 ''')
 print("Table created successfully.")
 
+# Add the full-text search index and the triggers that keep it in sync
+migrate_log_schema(conn)
+print("Migrations applied successfully.")
+
 # Close the connection
 conn.close()
\ No newline at end of file
@@ -0,0 +1,147 @@
+# jobs.py
+# In-process worker pool for long-running requests (debates, OSINT reports) that
+# clients submit once and then poll, instead of holding a connection open.
+import copy
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_MAX_WORKERS = int(os.getenv("JOB_MAX_WORKERS", "4"))
+JOB_QUEUE_DEPTH = int(os.getenv("JOB_QUEUE_DEPTH", "32"))
+JOB_RETENTION_MINUTES = int(os.getenv("JOB_RETENTION_MINUTES", "60"))
+
+
+class JobQueueFull(Exception):
+    """Raised when JOB_QUEUE_DEPTH jobs are already waiting for a worker."""
+
+
+class JobManager:
+    """
+    Runs jobs on a bounded thread pool and keeps their status, partial results and
+    final result for JOB_RETENTION_MINUTES. If a shared `store` (a cache from cache.py)
+    is given, snapshots are published there too, so any worker process can answer a poll.
+    """
+
+    def __init__(self, max_workers=JOB_MAX_WORKERS, max_queue_depth=JOB_QUEUE_DEPTH,
+                 retention_seconds=JOB_RETENTION_MINUTES * 60, store=None):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.retention_seconds = retention_seconds
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="atlas-job")
+        self._jobs = {}
+        self._queued = 0
+        self._running = 0
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def submit(self, kind, params, runner):
+        """
+        Queues `runner(update)` and returns the new job id. `update(fn, publish=True)` lets
+        the runner mutate the job's partial results; publish=False skips the shared store
+        (useful for high-frequency updates such as token deltas).
+        """
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._prune()
+            if self._queued >= self.max_queue_depth:
+                self.rejected += 1
+                raise JobQueueFull(f"Job queue is full ({self.max_queue_depth} jobs waiting).")
+            job = {
+                "job_id": job_id,
+                "kind": kind,
+                "params": params,
+                "status": "queued",
+                "created_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "partial": {},
+                "result": None,
+                "error": None
+            }
+            self._jobs[job_id] = job
+            self._queued += 1
+            self.submitted += 1
+        self._publish(job_id)
+        self._executor.submit(self._run, job_id, runner)
+        return job_id
+
+    def _run(self, job_id, runner):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._queued -= 1
+            self._running += 1
+        self._publish(job_id)
+
+        def update(fn, publish=True):
+            with self._lock:
+                fn(job["partial"])
+            if publish:
+                self._publish(job_id)
+
+        try:
+            result = runner(update)
+            with self._lock:
+                job["status"] = "succeeded"
+                job["result"] = result
+                self.succeeded += 1
+        except Exception as e:
+            with self._lock:
+                job["status"] = "failed"
+                job["error"] = str(e)
+                self.failed += 1
+        finally:
+            with self._lock:
+                job["finished_at"] = time.time()
+                self._running -= 1
+            self._publish(job_id)
+
+    def _snapshot(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return copy.deepcopy(job) if job else None
+
+    def _publish(self, job_id):
+        if self.store is None:
+            return
+        snapshot = self._snapshot(job_id)
+        if snapshot:
+            try:
+                self.store.set(job_id, snapshot)
+            except Exception as e:
+                print(f"⚠️ Could not publish job {job_id}: {e}")
+
+    def _prune(self):
+        # Caller holds the lock.
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job["finished_at"] and job["finished_at"] < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        """Returns a snapshot of the job, from this process or the shared store, or None."""
+        snapshot = self._snapshot(job_id)
+        if snapshot is None and self.store is not None:
+            snapshot = self.store.get(job_id)
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "running": self._running,
+                "max_workers": self.max_workers,
+                "max_queue_depth": self.max_queue_depth,
+                "retained": len(self._jobs),
+                "submitted": self.submitted,
+                "rejected": self.rejected,
+                "succeeded": self.succeeded,
+                "failed": self.failed
+            }
@@ -0,0 +1,208 @@
+# packing.py
+# Fits retrieved evidence into a token budget before it goes into a prompt: paragraphs are
+# deduplicated, over-long ones truncated, and the most topic-relevant ones kept (in their
+# original order) until the budget is spent.
+import math
+import os
+import re
+import unicodedata
+from cache import STOP_WORDS
+
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+PARAGRAPH_MAX_TOKENS = int(os.getenv("PARAGRAPH_MAX_TOKENS", "300"))
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+ARTICLE_START = "--- ARTICLE START ---"
+ARTICLE_END = "--- ARTICLE END ---"
+CONTENT_MARKER = "CONTENT:"
+ARTICLE_BLOCK = re.compile(re.escape(ARTICLE_START) + r"\n(.*?)" + re.escape(ARTICLE_END), re.S)
+SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def words_of(text, strip_stopwords=False):
+    """Case-folded words with punctuation stripped from their edges, for relevance scoring."""
+    words = []
+    for token in unicodedata.normalize("NFKC", text).casefold().split():
+        start, end = 0, len(token)
+        while start < end and unicodedata.category(token[start])[0] == "P":
+            start += 1
+        while end > start and unicodedata.category(token[end - 1])[0] == "P":
+            end -= 1
+        word = token[start:end]
+        if word and not (strip_stopwords and word in STOP_WORDS):
+            words.append(word)
+    return words
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token for English with Llama-style tokenizers)."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cuts `text` to about `max_tokens`, at a sentence boundary when there is one."""
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    sentences = SENTENCE_END.split(cut)
+    if len(sentences) > 1:
+        return " ".join(sentences[:-1])
+    return cut.rsplit(" ", 1)[0] + " …"
+
+
+def split_blocks(article_text):
+    """
+    Splits get_article_content() output into (header, paragraphs) blocks. Anything that is
+    not an article block (e.g. the headline-only fallback) becomes one block of lines.
+    """
+    blocks = []
+    for match in ARTICLE_BLOCK.finditer(article_text):
+        header, _, content = match.group(1).partition(CONTENT_MARKER)
+        paragraphs = [p.strip() for p in re.split(r"\n\s*\n", content) if p.strip()]
+        blocks.append((f"{ARTICLE_START}\n{header}{CONTENT_MARKER}\n", paragraphs))
+    if not blocks and article_text.strip():
+        blocks.append(("", [line.strip() for line in article_text.splitlines() if line.strip()]))
+    return blocks
+
+
+def _shingles(words, size=5):
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _relevance(words, position, topic_terms):
+    if not words:
+        return 0.0
+    matches = sum(1 for word in words if word in topic_terms)
+    coverage = len(topic_terms.intersection(words)) / len(topic_terms) if topic_terms else 0.0
+    # Term density plus coverage of the topic, with a small bonus for an article's lede.
+    return matches / math.sqrt(len(words)) + coverage + 0.5 / (1 + position)
+
+
+def pack_evidence(article_text, topic, budget_tokens):
+    """
+    Returns (packed_text, stats). Keeps the highest-scoring unique paragraphs whose
+    estimated tokens, plus their article headers, fit in `budget_tokens`.
+    """
+    blocks = split_blocks(article_text)
+    topic_terms = set(words_of(topic, strip_stopwords=True))
+
+    candidates = []
+    seen_exact = set()
+    seen_shingles = []
+    duplicates = 0
+    for block_index, (_, paragraphs) in enumerate(blocks):
+        for position, paragraph in enumerate(paragraphs):
+            words = words_of(paragraph)
+            fingerprint = " ".join(words)
+            if not fingerprint:
+                continue
+            shingles = _shingles(words)
+            if fingerprint in seen_exact or any(
+                    len(shingles & seen) / len(shingles | seen) >= NEAR_DUPLICATE_THRESHOLD for seen in seen_shingles):
+                duplicates += 1
+                continue
+            seen_exact.add(fingerprint)
+            seen_shingles.append(shingles)
+            text = truncate_to_tokens(paragraph, PARAGRAPH_MAX_TOKENS)
+            candidates.append({
+                "block": block_index,
+                "position": position,
+                "text": text,
+                "tokens": estimate_tokens(text) + 1,
+                "score": _relevance(words, position, topic_terms)
+            })
+
+    used = 0
+    opened_blocks = set()
+    selected = []
+    for candidate in sorted(candidates, key=lambda c: c["score"], reverse=True):
+        cost = candidate["tokens"]
+        if candidate["block"] not in opened_blocks:
+            cost += estimate_tokens(blocks[candidate["block"]][0]) + estimate_tokens(ARTICLE_END) + 1
+        if used + cost > budget_tokens:
+            continue
+        used += cost
+        opened_blocks.add(candidate["block"])
+        selected.append(candidate)
+
+    selected.sort(key=lambda c: (c["block"], c["position"]))
+    parts = []
+    for block_index, (header, _) in enumerate(blocks):
+        paragraphs = [c["text"] for c in selected if c["block"] == block_index]
+        if not paragraphs:
+            continue
+        body = "\n\n".join(paragraphs)
+        parts.append(f"{header}{body}\n{ARTICLE_END}\n\n" if header else f"{body}\n")
+
+    packed_text = "".join(parts)
+    stats = {
+        "budget_tokens": budget_tokens,
+        "input_tokens": estimate_tokens(article_text),
+        "packed_tokens": estimate_tokens(packed_text),
+        "paragraphs_kept": len(selected),
+        "paragraphs_total": len(candidates) + duplicates,
+        "duplicates_dropped": duplicates
+    }
+    return packed_text, stats
+
+
+def _source_name(header):
+    for line in header.splitlines():
+        if line.startswith("SOURCE:"):
+            return line[len("SOURCE:"):].strip()
+    return None
+
+
+def extractive_brief(article_text, topic, budget_tokens):
+    """
+    Condenses the evidence into bullet-point sentences on CPU: sentences are scored by topic
+    coverage plus centrality (how many of their words recur across all articles), and the best
+    unique ones are kept, in reading order and attributed to their source, within the budget.
+    """
+    topic_terms = set(words_of(topic, strip_stopwords=True))
+    sentences = []
+    for header, paragraphs in split_blocks(article_text):
+        source = _source_name(header)
+        for paragraph in paragraphs:
+            for sentence in SENTENCE_END.split(paragraph):
+                sentence = " ".join(sentence.split())
+                words = words_of(sentence, strip_stopwords=True)
+                if len(words) >= 4:
+                    sentences.append({"order": len(sentences), "source": source, "text": sentence, "words": words})
+
+    frequency = {}
+    for sentence in sentences:
+        for word in set(sentence["words"]):
+            frequency[word] = frequency.get(word, 0) + 1
+    max_frequency = max(frequency.values(), default=1)
+
+    seen = set()
+    candidates = []
+    for sentence in sentences:
+        fingerprint = " ".join(sentence["words"])
+        if fingerprint in seen:
+            continue
+        seen.add(fingerprint)
+        words = sentence["words"]
+        unique_words = set(words)
+        coverage = len(topic_terms & unique_words) / len(topic_terms) if topic_terms else 0.0
+        centrality = sum(frequency[word] for word in unique_words) / (len(unique_words) * max_frequency)
+        sentence["score"] = 2 * coverage + centrality
+        line = f"- {truncate_to_tokens(sentence['text'], PARAGRAPH_MAX_TOKENS)}"
+        sentence["line"] = f"{line} ({sentence['source']})" if sentence["source"] else line
+        candidates.append(sentence)
+
+    used = 0
+    selected = []
+    for sentence in sorted(candidates, key=lambda s: s["score"], reverse=True):
+        cost = estimate_tokens(sentence["line"]) + 1
+        if used + cost > budget_tokens:
+            continue
+        used += cost
+        selected.append(sentence)
+
+    selected.sort(key=lambda s: s["order"])
+    return "\n".join(sentence["line"] for sentence in selected)
@@ -0,0 +1,122 @@
+# semantic_cache.py
+# Optional paraphrase-tolerant cache: topics are embedded with a hashed character
+# n-gram vectorizer and matched by cosine similarity against past results.
+import os
+import threading
+import time
+import zlib
+from cache import normalize_topic
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "2048"))
+SEMANTIC_CACHE_DIM = int(os.getenv("SEMANTIC_CACHE_DIM", "4096"))
+
+
+def embed_topic(topic, dim=SEMANTIC_CACHE_DIM):
+    """
+    Hashed bag of character 3-5-grams plus whole words, L2-normalized.
+    Cheap enough to run on every request and needs no model download.
+    """
+    text = normalize_topic(topic, strip_stopwords=True)
+    features = text.split()
+    padded = f" {text} "
+    for n in (3, 4, 5):
+        features.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+    vector = np.zeros(dim, dtype=np.float32)
+    for feature in features:
+        digest = zlib.crc32(feature.encode("utf-8"))
+        # The top bit picks the sign so colliding features partly cancel out.
+        vector[digest % dim] += 1.0 if digest & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class _Index:
+    def __init__(self, dim):
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.expires_at = np.zeros(0, dtype=np.float64)
+        self.topics = []
+        self.values = []
+
+
+class SemanticCache:
+    """
+    In-process nearest-neighbour cache, partitioned (e.g. per model) so a debate run
+    on one model is never served for another. Returns a cached value when the best
+    match's cosine similarity reaches `threshold`.
+    """
+
+    def __init__(self, name, ttl_seconds, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 max_entries=SEMANTIC_CACHE_MAX_ENTRIES, dim=SEMANTIC_CACHE_DIM):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.dim = dim
+        self._indexes = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, topic, partition):
+        """Returns (value, matched_topic, similarity) for the closest live match, or None."""
+        query = embed_topic(topic, self.dim)
+        with self._lock:
+            index = self._indexes.get(partition)
+            if index is None or not index.topics:
+                self.misses += 1
+                return None
+            similarities = index.vectors @ query
+            similarities[index.expires_at <= time.time()] = -1.0
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return index.values[best], index.topics[best], similarity
+
+    def add(self, topic, partition, value):
+        vector = embed_topic(topic, self.dim)
+        now = time.time()
+        with self._lock:
+            index = self._indexes.setdefault(partition, _Index(self.dim))
+            # Drop expired rows, then the oldest ones if we're still over capacity.
+            live = np.flatnonzero(index.expires_at > now)
+            if len(live) >= self.max_entries:
+                live = live[len(live) - self.max_entries + 1:]
+            if len(live) < len(index.topics):
+                index.vectors = index.vectors[live]
+                index.expires_at = index.expires_at[live]
+                index.topics = [index.topics[i] for i in live]
+                index.values = [index.values[i] for i in live]
+            index.vectors = np.vstack([index.vectors, vector[np.newaxis, :]])
+            index.expires_at = np.append(index.expires_at, now + self.ttl_seconds)
+            index.topics.append(topic)
+            index.values.append(value)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": sum(len(index.topics) for index in self._indexes.values()),
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+def build_semantic_cache(name, ttl_seconds):
+    """Returns a SemanticCache if enabled and NumPy is available, otherwise None."""
+    if not SEMANTIC_CACHE_ENABLED:
+        return None
+    if np is None:
+        print(f"⚠️ SEMANTIC_CACHE_ENABLED is set but NumPy is not installed; {name} semantic cache disabled.")
+        return None
+    return SemanticCache(name, ttl_seconds)
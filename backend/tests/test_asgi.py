@@ -0,0 +1,105 @@
+# test_asgi.py
+# Run from backend/: python -m unittest discover tests
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+# app.py opens its databases relative to the working directory; keep the real ones untouched.
+os.chdir(tempfile.mkdtemp())
+os.environ.setdefault("HF_TOKEN_1", "test-token")
+os.environ["CACHE_BACKEND"] = "memory"
+
+import app as atlas
+import asgi
+
+STAGE_SECONDS = 0.5
+
+
+def slow_osint_pipeline(topic, model_id):
+    for word in ("slow", "report"):
+        time.sleep(STAGE_SECONDS / 2)
+        yield "token", {"role": "osint_analyst", "delta": word}
+
+
+async def call(scope_path, body=None, method="POST"):
+    payload = json.dumps(body or {}).encode("utf-8")
+    scope = {"type": "http", "method": method, "path": scope_path, "query_string": b"", "root_path": "",
+             "http_version": "1.1", "headers": [(b"content-type", b"application/json"),
+                         (b"content-length", str(len(payload)).encode())]}
+    messages = [{"type": "http.request", "body": payload, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    await asgi.app(scope, receive, send)
+    return sent
+
+
+class FlaskFallbackConcurrencyTest(unittest.TestCase):
+    """Flask routes served through asgi.app must not queue behind each other on one thread."""
+
+    def setUp(self):
+        self.original_pipeline = atlas.stream_osint_pipeline
+        atlas.stream_osint_pipeline = slow_osint_pipeline
+
+    def tearDown(self):
+        atlas.stream_osint_pipeline = self.original_pipeline
+
+    def test_two_streams_run_concurrently(self):
+        async def run():
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                call("/analyze_topic/stream", {"topic": "first topic"}),
+                call("/analyze_topic/stream", {"topic": "second topic"}),
+                call("/stats", method="GET")
+            )
+            return time.perf_counter() - start, results
+
+        elapsed, results = asyncio.run(run())
+        for sent in results:
+            self.assertEqual(sent[0]["status"], 200)
+        for sent in results[:2]:
+            body = b"".join(message.get("body", b"") for message in sent[1:])
+            self.assertIn(b"report", body)
+        # Serialised, the two streams alone would take 2 * STAGE_SECONDS.
+        self.assertLess(elapsed, 1.5 * STAGE_SECONDS)
+
+
+
+class AsyncSingleFlightCancellationTest(unittest.TestCase):
+    """Waiters must not hang when the leader of their flight is cancelled."""
+
+    def test_waiter_takes_over_from_cancelled_leader(self):
+        async def run():
+            flights = asgi.AsyncSingleFlight(atlas.DEBATE_FLIGHTS)
+            calls = []
+
+            async def compute():
+                calls.append(1)
+                await asyncio.sleep(0.2)
+                return len(calls)
+
+            leader = asyncio.create_task(flights.do("topic", compute))
+            await asyncio.sleep(0.05)
+            waiter = asyncio.create_task(flights.do("topic", compute))
+            await asyncio.sleep(0.05)
+            leader.cancel()
+            return await asyncio.wait_for(waiter, 2), flights._flights
+
+        value, pending = asyncio.run(run())
+        self.assertEqual(value, 2)
+        self.assertEqual(pending, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+# test_compression.py
+# Run from backend/: python -m unittest discover tests
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compression import LogCompressor, train_dictionary
+from db import dictionary_loader, register_functions
+
+REPORT = "Sources I Have Analyzed\nReuters reported new figures on topic {0}.\nFinal Conclusion\n" \
+         + "Some repeated body line about the economy and policy. " * 20
+
+
+class TwoWorkerDictionaryTest(unittest.TestCase):
+    """A worker must decompress rows written with a dictionary trained after it started."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(handle)
+        conn = sqlite3.connect(self.path)
+        conn.execute("""
+            CREATE TABLE compression_dictionaries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, codec TEXT NOT NULL, data BLOB NOT NULL,
+                samples INTEGER NOT NULL, created_at TEXT NOT NULL
+            )
+        """)
+        conn.execute("CREATE TABLE conversation_logs (id INTEGER PRIMARY KEY, ai_response TEXT)")
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def _train(self, conn, compressor, samples):
+        data = train_dictionary(samples, codec="zlib")
+        cursor = conn.execute(
+            "INSERT INTO compression_dictionaries (codec, data, samples, created_at) VALUES ('zlib', ?, ?, '')",
+            (data, len(samples))
+        )
+        conn.commit()
+        compressor.add_dictionary(cursor.lastrowid, "zlib", data)
+
+    def test_old_worker_reads_rows_compressed_with_a_newer_dictionary(self):
+        old_conn, new_conn = sqlite3.connect(self.path), sqlite3.connect(self.path)
+        old_worker, new_worker = LogCompressor(codec="zlib"), LogCompressor(codec="zlib")
+        register_functions(old_conn, old_worker)
+        register_functions(new_conn, new_worker)
+
+        self._train(old_conn, old_worker, [])
+        self._train(new_conn, new_worker, [REPORT.format(i) for i in range(60)])
+
+        text = REPORT.format("new")
+        blob = new_worker.compress(text)
+        self.assertEqual(int.from_bytes(blob[1:5], "big"), 2)
+        new_conn.execute("INSERT INTO conversation_logs (ai_response) VALUES (?)", (blob,))
+        new_conn.commit()
+
+        self.assertEqual(old_conn.execute("SELECT log_text(ai_response) FROM conversation_logs").fetchone()[0], text)
+        self.assertEqual(old_worker.decompress(blob), text)
+        self.assertEqual(old_worker.stats()["dictionaries_loaded"], 1)
+        old_conn.close()
+        new_conn.close()
+
+    def test_unknown_dictionary_raises(self):
+        worker = LogCompressor(codec="zlib", loader=dictionary_loader(self.path))
+        with self.assertRaises(KeyError):
+            worker.decompress(bytes([1]) + (99).to_bytes(4, "big") + b"payload")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+# test_http_pool.py
+# Run from backend/: python -m unittest discover tests
+import os
+import sys
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from http_pool import get_http_session, read_before_deadline
+
+
+class DripHandler(BaseHTTPRequestHandler):
+    """Serves /drip one byte every 0.2s (far slower than any per-read timeout) and /fast at once."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        body = b"x" * 50 if self.path == "/drip" else b"fast body"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        try:
+            if self.path != "/drip":
+                self.wfile.write(body)
+                return
+            for byte in body:
+                self.wfile.write(bytes([byte]))
+                self.wfile.flush()
+                time.sleep(0.2)
+        except OSError:
+            pass
+
+
+class ReadBeforeDeadlineTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), DripHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def test_slow_drip_is_abandoned_at_the_deadline(self):
+        start = time.monotonic()
+        response = get_http_session().get(f"{self.base_url}/drip", timeout=20, stream=True)
+        with self.assertRaises(requests.exceptions.Timeout):
+            read_before_deadline(response, start + 1)
+        self.assertLess(time.monotonic() - start, 1.5)
+
+    def test_body_is_available_after_reading(self):
+        response = get_http_session().get(f"{self.base_url}/fast", timeout=20, stream=True)
+        self.assertEqual(read_before_deadline(response, time.monotonic() + 5).text, "fast body")
+
+
+if __name__ == "__main__":
+    unittest.main()